@@ -7,25 +7,71 @@ Restructured by: Gemini AI | Enhanced by: GitHub Copilot
 import sys
 import os
 import csv
+import json
+import sqlite3
 import time
+STARTUP_T0 = time.perf_counter()        # Reference point for first-paint / ready timings
+import queue
 import threading
 import webbrowser
+import argparse
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from abc import ABC, abstractmethod
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
-from collections import deque
+from collections import deque, OrderedDict
 
 try:
-    import cv2
-    from deepface import DeepFace
     import numpy as np
     import customtkinter as ctk
     import tkinter as tk
     from tkinter import ttk, messagebox
     from PIL import Image, ImageTk, ImageDraw
-    import pyttsx3
 except Exception as e:
     print(f"Missing Library Error: {e}")
     sys.exit(1)
 
+# Heavy/optional modules are bound by load_runtime_modules(), off the UI thread
+cv2 = None
+DeepFace = None
+pyttsx3 = None
+MODULE_ERRORS = {}                      # module -> import error
+
+# Inference engine for this process (see INFERENCE_ENGINES); set from the command line
+ENGINE_SETTINGS = {"engine": "deepface", "threads": None, "model_dir": None, "emotion_model": "float32"}
+
+def load_runtime_modules(progress=None):
+    """Import OpenCV, DeepFace (TensorFlow) and pyttsx3 into module globals.
+
+    DeepFace is skipped unless the configured inference engine needs it.
+    Safe to call repeatedly; `progress(fraction, text)` is called before each
+    step. Returns MODULE_ERRORS, which holds the modules that failed to load.
+    """
+    global cv2, DeepFace, pyttsx3
+    steps = [("cv2", "camera support (OpenCV)"), ("deepface", "AI models (TensorFlow)"), ("pyttsx3", "voice engine")]
+    if ENGINE_SETTINGS["engine"] != "deepface": del steps[1]
+    for i, (name, label) in enumerate(steps):
+        if progress: progress(i / len(steps), f"⏳ Loading {label}...")
+        try:
+            if name == "cv2" and cv2 is None:
+                import cv2 as module
+                cv2 = module
+            elif name == "deepface" and DeepFace is None:
+                from deepface import DeepFace as module
+                DeepFace = module
+            elif name == "pyttsx3" and pyttsx3 is None:
+                import pyttsx3 as module
+                pyttsx3 = module
+            MODULE_ERRORS.pop(name, None)
+        except Exception as e:
+            MODULE_ERRORS[name] = e
+    if progress: progress(1.0, "")
+    return MODULE_ERRORS
+
 # =========================
 # AURORA GRADIENT THEME CONFIGURATION
 # =========================
@@ -151,12 +197,46 @@ EMOTION_DATA = {
 # =========================
 
 class EmotionSmoother:
-    def __init__(self, size=5):
-        self.history = deque(maxlen=size)
-    def add(self, emo): self.history.append(emo)
+    """Time-decayed per-class score sums with hysteresis.
+
+    Every update decays the running sums by 0.5 ** (dt / half_life) and adds
+    the new class probabilities, so each update costs O(classes) however long
+    the effective window is. The reported label only changes when a rival's
+    score beats the current label's by more than `hysteresis`.
+    """
+    def __init__(self, half_life=3.0, hysteresis=0.15):
+        self.half_life = half_life
+        self.hysteresis = hysteresis
+        self.reset()
+
+    def reset(self):
+        self.scores = {}
+        self.total = 0.0
+        self.last_t = None
+        self.label = None
+
+    def add(self, emo, scores=None, t=None):
+        """`scores` are DeepFace-style percentages; without them `emo` counts as 100%"""
+        t = time.time() if t is None else t
+        if self.last_t is not None:
+            decay = 0.5 ** (max(0.0, t - self.last_t) / self.half_life)
+            for k in self.scores: self.scores[k] *= decay
+            self.total *= decay
+        self.last_t = t
+        total = sum(scores.values()) if scores else 0.0
+        probs = {k: v / total for k, v in scores.items()} if total > 0 else {emo: 1.0}
+        for k, p in probs.items(): self.scores[k] = self.scores.get(k, 0.0) + p
+        self.total += 1.0
+        best = max(self.scores, key=self.scores.get)
+        if self.label is None or self.scores[best] > self.scores.get(self.label, 0.0) * (1 + self.hysteresis):
+            self.label = best
+
     def get(self):
-        if not self.history: return "neutral"
-        return max(set(self.history), key=self.history.count)
+        return self.label or "neutral"
+
+    def confidence(self):
+        """Share of the decayed evidence that backs the current label (0-1)"""
+        return self.scores.get(self.label, 0.0) / self.total if self.total else 0.0
 
 class MediaCycleManager:
     def __init__(self):
@@ -170,13 +250,1914 @@ class MediaCycleManager:
         self.counters[emo] = (idx + 1) % 3
         return MEDIA_CYCLES[emo], idx, self.streak
 
+class PipelineMetrics:
+    """Rolling per-stage timings plus gauges, shared by the whole pipeline.
+
+    Stages record wall time in seconds into a fixed window per stage, which
+    snapshot() turns into p50/p95/p99. Gauges are callables (queue depths,
+    drop counters) that are only evaluated when a snapshot is taken, so the
+    hot path pays for one deque append per stage.
+    """
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window=500):
+        self.window = window
+        self.lock = threading.Lock()
+        self.timings = {}               # stage -> deque of seconds
+        self.totals = {}                # stage -> samples ever recorded
+        self.gauges = {}                # name -> () -> number
+        self.dump_thread = None
+
+    def record(self, stage, seconds):
+        with self.lock:
+            samples = self.timings.get(stage)
+            if samples is None: samples = self.timings[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self.totals[stage] = self.totals.get(stage, 0) + 1
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def snapshot(self):
+        with self.lock:
+            timings = {stage: sorted(samples) for stage, samples in self.timings.items()}
+            totals = dict(self.totals)
+        stages = {}
+        for stage, samples in timings.items():
+            if not samples: continue
+            n = len(samples)
+            stages[stage] = {"count": totals[stage],
+                             **{f"p{int(q * 100)}_ms": samples[min(n - 1, int(q * n))] * 1000 for q in self.QUANTILES}}
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try: gauges[name] = fn()
+            except Exception: pass
+        return {"time": time.time(), "stages": stages, "gauges": gauges}
+
+    def to_prometheus(self, snap=None):
+        snap = snap or self.snapshot()
+        lines = ["# TYPE moodpro_stage_seconds summary"]
+        for stage, st in snap["stages"].items():
+            for q in self.QUANTILES:
+                lines.append(f'moodpro_stage_seconds{{stage="{stage}",quantile="{q}"}} {st[f"p{int(q * 100)}_ms"] / 1000:.6f}')
+            lines.append(f'moodpro_stage_seconds_count{{stage="{stage}"}} {st["count"]}')
+        for name, value in snap["gauges"].items():
+            # Unavailable gauges (e.g. RSS without /proc or psutil) are None: leave them out
+            if isinstance(value, bool): value = int(value)
+            if not isinstance(value, (int, float)): continue
+            metric = f"moodpro_{name.replace('.', '_')}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def overlay_lines(self, snap=None):
+        """Compact per-stage text for the preview overlay"""
+        snap = snap or self.snapshot()
+        return [f"{stage:<15} p50 {st['p50_ms']:6.1f}  p95 {st['p95_ms']:6.1f}  p99 {st['p99_ms']:6.1f} ms"
+                for stage, st in sorted(snap["stages"].items())]
+
+    def dump(self, path):
+        """Write `path` as JSON and `<path>.prom` as Prometheus text, atomically"""
+        snap = self.snapshot()
+        for target, text in ((path, json.dumps(snap, indent=2)), (path + ".prom", self.to_prometheus(snap))):
+            with open(target + ".tmp", "w", encoding="utf-8") as f: f.write(text)
+            os.replace(target + ".tmp", target)
+
+    def start_dump(self, path, interval=10.0):
+        def run():
+            while True:
+                time.sleep(interval)
+                try: self.dump(path)
+                except OSError as e: print(f"Metrics dump failed: {e}")
+        self.dump_thread = threading.Thread(target=run, daemon=True)
+        self.dump_thread.start()
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics": body, ctype = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json": body, ctype = json.dumps(metrics.snapshot()), "application/json"
+                else: return self.send_error(404)
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args): pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+METRICS = PipelineMetrics()
+
+class InferenceWorker:
+    """Long-lived analysis thread(s) serving every stream's latest frame round-robin; stale results are dropped"""
+    def __init__(self, handler, on_result, workers=1, on_latency=None, on_release=None):
+        self.handler = handler          # (key, job) -> result (runs on worker thread)
+        self.on_result = on_result      # (key, ts, result) -> None
+        self.on_latency = on_latency    # (key, seconds) -> None, called after every handler run
+        self.on_release = on_release    # (key, job) -> None, once the worker is done with a job
+        self.workers = workers
+        self.cond = threading.Condition()
+        self.pending = {}               # key -> (ts, job)
+        self.order = deque()            # keys with a pending job, in service order
+        self.threads = []
+        self.running = False
+        self.last_ts = {}
+        self.stats = {"submitted": 0, "dropped": 0, "processed": 0, "stale": 0}
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(self.workers)]
+        for t in self.threads: t.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            dropped = list(self.pending.items())
+            self.pending.clear()
+            self.order.clear()
+            self.cond.notify_all()
+        for key, (_, job) in dropped: self._release(key, job)
+        for t in self.threads: t.join(timeout=1.0)
+        self.threads = []
+        self.last_ts.clear()
+
+    def submit(self, job, ts, key=0):
+        replaced = None
+        with self.cond:
+            self.stats["submitted"] += 1
+            if key in self.pending:
+                self.stats["dropped"] += 1
+                replaced = self.pending[key][1]
+            else: self.order.append(key)
+            self.pending[key] = (ts, job)
+            self.cond.notify()
+        if replaced is not None: self._release(key, replaced)
+
+    def _release(self, key, job):
+        if self.on_release: self.on_release(key, job)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.order: self.cond.wait(0.2)
+                if not self.running: return
+                key = self.order.popleft()
+                ts, job = self.pending.pop(key)
+            t0 = time.perf_counter()
+            try:
+                result = self.handler(key, job)
+            except Exception:
+                result = None
+            finally:
+                self._release(key, job)
+            if self.on_latency: self.on_latency(key, time.perf_counter() - t0)
+            with self.cond:
+                if ts < self.last_ts.get(key, 0.0):
+                    self.stats["stale"] += 1
+                    continue
+                self.last_ts[key] = ts
+                self.stats["processed"] += 1
+            self.on_result(key, ts, result)
+
+def _inference_process_main(index, shm_name, slot_bytes, requests, results, engine_settings):
+    """Inference process entry: reads frames from shared-memory slots"""
+    ENGINE_SETTINGS.update(engine_settings)  # spawn re-imports this module with the defaults
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            load_runtime_modules()
+            warm_up_models()
+            pipeline = EmotionPipeline(cache=EmotionCache())
+        except Exception as e:
+            # slot None: this process could not start, `index` tells the parent which one
+            results.put((None, index, f"{type(e).__name__}: {e}", 0.0))
+            return
+        while True:
+            item = requests.get()
+            if item is None: break
+            slot, shape, ts, rect = item
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            t0 = time.perf_counter()
+            try:
+                result = pipeline.classify(frame, rect)
+            except Exception:
+                result = None
+            del frame  # Release the buffer export before the parent reuses the slot
+            results.put((slot, ts, result, time.perf_counter() - t0))
+    finally:
+        shm.close()
+
+class ProcessInferenceWorker:
+    """Drop-in InferenceWorker that runs the models in worker processes, passing frames through shared memory"""
+    def __init__(self, on_result, processes=2, max_frame_bytes=1920 * 1080 * 3,
+                 on_latency=None, post=None, on_release=None, on_error=None):
+        self.on_result = on_result
+        self.on_latency = on_latency
+        self.post = post
+        self.on_release = on_release    # (key, job) once the frame has been copied out or dropped
+        self.on_error = on_error        # (message, processes_left) when a process fails
+        self.processes = processes
+        self.slot_bytes = max_frame_bytes
+        self.lock = threading.Lock()
+        self.running = False
+        self.pending = {}               # key -> (ts, frame, rect)
+        self.order = deque()
+        self.free = []
+        self.inflight = {}              # slot -> (key, ts, shape, rect, process index)
+        self.ready = deque()            # Indexes of processes without a job
+        self.dead = set()
+        self.last_ts = {}
+        self.stats = {"submitted": 0, "dropped": 0, "processed": 0, "stale": 0, "oversize": 0}
+
+    def start(self):
+        if self.running: return
+        ctx = mp.get_context("spawn")
+        slots = self.processes + 1
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+        self.free = list(range(slots))
+        # One request queue per process, so a dead process's slots can be reclaimed
+        self.requests = [ctx.Queue() for _ in range(self.processes)]
+        self.results = ctx.Queue()
+        self.procs = [ctx.Process(target=_inference_process_main, daemon=True,
+                                  args=(i, self.shm.name, self.slot_bytes, self.requests[i], self.results,
+                                        dict(ENGINE_SETTINGS)))
+                      for i in range(self.processes)]
+        self.ready = deque(range(self.processes))
+        self.dead = set()
+        for p in self.procs: p.start()
+        self.running = True
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        for q in self.requests: q.put(None)
+        for p in self.procs:
+            p.join(timeout=2.0)
+            if p.is_alive(): p.terminate()
+        self.collector.join(timeout=1.0)
+        with self.lock:
+            dropped = list(self.pending.items())
+            self.pending.clear()
+            self.order.clear()
+            self.inflight.clear()
+            self.last_ts.clear()
+        for key, (_, frame, rect) in dropped: self._release(key, (frame, rect))
+        self.shm.close()
+        self.shm.unlink()
+
+    def submit(self, job, ts, key=0):
+        frame, rect = job
+        released = []
+        with self.lock:
+            self.stats["submitted"] += 1
+            if frame.nbytes > self.slot_bytes:
+                self.stats["oversize"] += 1
+                released.append((key, job))
+            else:
+                if key in self.pending:
+                    self.stats["dropped"] += 1
+                    _, old_frame, old_rect = self.pending[key]
+                    released.append((key, (old_frame, old_rect)))
+                else: self.order.append(key)
+                self.pending[key] = (ts, frame, rect)
+                released += self._dispatch()
+        for key, job in released: self._release(key, job)
+
+    def _release(self, key, job):
+        if self.on_release: self.on_release(key, job)
+
+    def _view(self, slot, shape):
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def _dispatch(self):
+        """Hand pending frames to free processes, round-robin by stream (lock held).
+
+        Returns the (key, job) pairs whose frames were copied into shared memory
+        and can be released by the caller once the lock is dropped.
+        """
+        copied = []
+        while self.order and self.free and self.ready:
+            key = self.order.popleft()
+            ts, frame, rect = self.pending.pop(key)
+            slot, proc = self.free.pop(), self.ready.popleft()
+            self._view(slot, frame.shape)[...] = frame
+            self.inflight[slot] = (key, ts, frame.shape, rect, proc)
+            self.requests[proc].put((slot, frame.shape, ts, rect))
+            copied.append((key, (frame, rect)))
+        return copied
+
+    def _fail(self, proc, message):
+        """Retire a dead or failed process and reclaim the slot it held"""
+        with self.lock:
+            if proc in self.dead: return
+            self.dead.add(proc)
+            if proc in self.ready: self.ready.remove(proc)
+            for slot in [s for s, info in self.inflight.items() if info[4] == proc]:
+                del self.inflight[slot]
+                self.free.append(slot)
+            left = self.processes - len(self.dead)
+            copied = self._dispatch()
+        for k, job in copied: self._release(k, job)
+        if self.on_error: self.on_error(message, left)
+
+    def _collect(self):
+        while self.running:
+            for i, p in enumerate(self.procs):
+                if i not in self.dead and not p.is_alive():
+                    self._fail(i, f"Inference process {i} exited with code {p.exitcode}")
+            try: slot, ts, result, latency = self.results.get(timeout=0.2)
+            except queue.Empty: continue
+            except (EOFError, OSError): break
+            if slot is None:
+                self._fail(ts, result)  # Startup failure: (None, index, message, 0.0)
+                continue
+            with self.lock:
+                info = self.inflight.get(slot)
+            if info is None: continue
+            key, _, shape, rect, proc = info
+            if self.on_latency: self.on_latency(key, latency)
+            if self.post: self.post(key, self._view(slot, shape), rect, result)
+            with self.lock:
+                del self.inflight[slot]
+                self.free.append(slot)
+                self.ready.append(proc)
+                fresh = ts >= self.last_ts.get(key, 0.0)
+                if fresh:
+                    self.last_ts[key] = ts
+                    self.stats["processed"] += 1
+                else:
+                    self.stats["stale"] += 1
+                copied = self._dispatch()
+            for k, job in copied: self._release(k, job)
+            if fresh: self.on_result(key, ts, result)
+
+class AnalysisScheduler:
+    """Picks the analysis rate from inference latency, a CPU budget and face presence.
+
+    `cpu_budget` is the fraction of wall time the inference worker may spend
+    busy, so the interval is latency / budget, clamped to [1/max_hz, 1/min_hz].
+    With no face in view the interval is stretched by `idle_factor`.
+    """
+    def __init__(self, min_hz=0.5, max_hz=8.0, cpu_budget=0.5, idle_factor=3.0):
+        self.min_hz = min_hz
+        self.max_hz = max_hz
+        self.cpu_budget = cpu_budget
+        self.idle_factor = idle_factor
+        self.latency = None             # EMA of inference latency, seconds
+        self.face_present = False
+        self.last_dispatch = 0.0
+        self.dispatches = deque(maxlen=20)
+
+    def record_latency(self, seconds):
+        self.latency = seconds if self.latency is None else 0.7 * self.latency + 0.3 * seconds
+
+    def interval(self):
+        iv = max(1.0 / self.max_hz, (self.latency or 0.0) / self.cpu_budget)
+        if not self.face_present: iv *= self.idle_factor
+        return min(iv, 1.0 / self.min_hz)
+
+    def target_hz(self):
+        return 1.0 / self.interval()
+
+    def due(self, now):
+        return now - self.last_dispatch >= self.interval()
+
+    def mark_dispatched(self, now):
+        self.last_dispatch = now
+        self.dispatches.append(now)
+
+    def achieved_hz(self):
+        """Actual dispatch rate over the recent window"""
+        if len(self.dispatches) < 2: return 0.0
+        span = max(self.dispatches[-1], time.time()) - self.dispatches[0]
+        return (len(self.dispatches) - 1) / span if span > 0 else 0.0
+
+class FaceTracker:
+    """Detect-once-then-track: follows the face between full detections.
+
+    Tracking is normalised template matching of the last detected face inside
+    a search window around its previous position, on a downscaled grayscale
+    frame, so it is cheap enough to run on every captured frame. The match
+    score is the track confidence; a full detection is requested every
+    `redetect_every` frames or as soon as confidence drops below the minimum.
+    """
+    def __init__(self, redetect_every=150, min_confidence=0.55, scale=0.5, search_margin=0.5):
+        self.redetect_every = redetect_every
+        self.min_confidence = min_confidence
+        self.scale = scale
+        self.search_margin = search_margin
+        self.lock = threading.Lock()
+        self.stats = {"detections": 0, "tracked": 0, "lost": 0}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.rect = None
+            self.template = None
+            self.confidence = 0.0
+            self.frames_since_detect = 0
+
+    def _small_gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def init(self, frame, rect):
+        """Start a new track from a full-detection result"""
+        small = self._small_gray(frame)
+        x, y, w, h = [int(round(v * self.scale)) for v in rect]
+        template = small[max(y, 0):y + h, max(x, 0):x + w]
+        with self.lock:
+            self.stats["detections"] += 1
+            if template.size == 0 or min(template.shape) < 8:
+                self.rect, self.template, self.confidence = None, None, 0.0
+                return
+            self.rect, self.template = tuple(rect), template.copy()
+            self.confidence = 1.0
+            self.frames_since_detect = 0
+
+    def update(self, frame):
+        """Follow the face into `frame`; returns the rect or None when lost"""
+        with self.lock:
+            if self.template is None: return None
+            self.frames_since_detect += 1
+            template, rect = self.template, self.rect
+        small = self._small_gray(frame)
+        th, tw = template.shape
+        x, y = int(rect[0] * self.scale), int(rect[1] * self.scale)
+        mx, my = int(tw * self.search_margin) + 1, int(th * self.search_margin) + 1
+        x0, y0 = max(x - mx, 0), max(y - my, 0)
+        x1, y1 = min(x + tw + mx, small.shape[1]), min(y + th + my, small.shape[0])
+        window = small[y0:y1, x0:x1]
+        if window.shape[0] < th or window.shape[1] < tw:
+            score, loc = 0.0, (0, 0)
+        else:
+            _, score, _, loc = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+        with self.lock:
+            if self.template is not template: return self.current()  # Re-detected meanwhile
+            self.confidence = float(score)
+            if score < self.min_confidence:
+                self.stats["lost"] += 1
+                return None
+            self.stats["tracked"] += 1
+            self.rect = (int((x0 + loc[0]) / self.scale), int((y0 + loc[1]) / self.scale), rect[2], rect[3])
+            return self.rect
+
+    def current(self):
+        return self.rect if self.template is not None and self.confidence >= self.min_confidence else None
+
+    def needs_detection(self):
+        with self.lock:
+            return self.current() is None or self.frames_since_detect >= self.redetect_every
+
+def crop_face(frame, rect):
+    x, y, w, h = rect
+    return frame[max(y, 0):y + h, max(x, 0):x + w]
+
+class FrameChangeGate:
+    """Cheap change detector run before dispatching an analysis.
+
+    Compares a downsampled grayscale of the face region (or the whole frame
+    when no face is tracked) with the one from the last analysed frame using
+    mean absolute difference. Below `threshold` the previous result can be
+    reused; `max_skips` consecutive skips force a fresh analysis anyway.
+    """
+    def __init__(self, threshold=4.0, size=32, max_skips=10):
+        self.threshold = threshold
+        self.size = size
+        self.max_skips = max_skips
+        self.checked = 0
+        self.skipped = 0
+        self.reset()
+
+    def reset(self):
+        self.reference = None
+        self.consecutive = 0
+        self.last_diff = None
+
+    def _signature(self, frame, rect):
+        region = crop_face(frame, rect) if rect else frame
+        if region.size == 0: region = frame
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA)
+
+    def changed(self, frame, rect=None):
+        """True if the scene moved past the threshold (and becomes the new reference)"""
+        sig = self._signature(frame, rect)
+        self.checked += 1
+        if self.reference is not None and self.consecutive < self.max_skips:
+            self.last_diff = float(cv2.absdiff(sig, self.reference).mean())
+            if self.last_diff < self.threshold:
+                self.skipped += 1
+                self.consecutive += 1
+                return False
+        self.reference = sig
+        self.consecutive = 0
+        return True
+
+    def skip_ratio(self):
+        return self.skipped / self.checked if self.checked else 0.0
+
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+def emotion_input(face, size=48):
+    """BGR face crop -> size x size grayscale in [0, 1], padded to square like DeepFace does"""
+    h, w = face.shape[:2]
+    side = max(h, w)
+    gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    square = np.zeros((side, side), dtype=np.uint8)
+    square[(side - h) // 2:(side - h) // 2 + h, (side - w) // 2:(side - w) // 2 + w] = gray
+    return cv2.resize(square, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+class EmotionBatcher:
+    """Micro-batching front end for the emotion model.
+
+    Callers block in classify() while a dispatcher thread collects pending
+    face crops for up to `max_wait_ms` or `max_batch` items, runs them through
+    the engine's model as one tensor and hands each caller its own row. Batch
+    sizes and queue-to-result latencies are kept as histograms. While the
+    dispatcher is not running, classify() runs the model inline instead.
+    """
+    LATENCY_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500)
+
+    def __init__(self, max_batch=8, max_wait_ms=5.0, engine=None, timeout=10.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout          # Longest a caller waits for its batch
+        self.requests = queue.Queue()
+        self.running = False
+        self.engine = engine            # None: the process-wide engine from get_engine()
+        self.batch_hist = {}            # batch size -> count
+        self.latency_hist = {b: 0 for b in self.LATENCY_BUCKETS_MS + (float("inf"),)}
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        self.thread.join(timeout=1.0)
+
+    def classify(self, face):
+        """Blocking; returns (dominant_emotion, {label: percent})"""
+        engine = self.engine or get_engine()
+        x = engine.prepare(face)
+        if not self.running: return engine.predict([x])[0]
+        item = {"x": x, "t0": time.perf_counter(), "done": threading.Event(), "out": None}
+        self.requests.put(item)
+        # A request that races with stop() may miss the final drain: don't wait on it forever
+        if not item["done"].wait(self.timeout): raise TimeoutError("emotion batch timed out")
+        if item["out"] is None: raise RuntimeError("emotion batch failed")
+        return item["out"]
+
+    def _run(self):
+        while self.running:
+            try: batch = [self.requests.get(timeout=0.2)]
+            except queue.Empty: continue
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0: break
+                try: batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty: break
+            try:
+                for b, out in zip(batch, (self.engine or get_engine()).predict([b["x"] for b in batch])):
+                    b["out"] = out
+            except Exception:
+                pass  # Callers see out=None and fall back
+            now = time.perf_counter()
+            self.batch_hist[len(batch)] = self.batch_hist.get(len(batch), 0) + 1
+            for b in batch:
+                ms = (now - b["t0"]) * 1000.0
+                self.latency_hist[next(k for k in self.latency_hist if ms <= k)] += 1
+                b["done"].set()
+        # Release anyone still waiting
+        while True:
+            try: self.requests.get_nowait()["done"].set()
+            except queue.Empty: break
+
+    def summary(self):
+        """Compact histogram text for the stats line"""
+        n = sum(self.batch_hist.values())
+        if not n: return "batch --"
+        avg = sum(k * v for k, v in self.batch_hist.items()) / n
+        sizes = " ".join(f"{k}:{v}" for k, v in sorted(self.batch_hist.items()))
+        lat = " ".join(f"≤{k:g}:{v}" for k, v in self.latency_hist.items() if v)
+        return f"batch avg {avg:.1f} [{sizes}] | ms [{lat}]"
+
+# Ordered by preference: most accurate first, cheapest last
+DETECTOR_CASCADE = ["retinaface", "mediapipe", "opencv", "ssd"]
+
+class DetectorCascade:
+    """Ordered detector backends with per-backend stats and a circuit breaker.
+
+    Each detection tries the backends in order until one succeeds. A backend
+    that fails `max_failures` times in a row is skipped for `cooldown`
+    seconds, then gets a single trial call; if every backend is cooling down
+    the one that recovers soonest is tried anyway.
+    """
+    def __init__(self, backends=None, max_failures=3, cooldown=60.0):
+        self.backends = list(backends or get_engine().detectors)
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.stats = {b: {"calls": 0, "ok": 0, "fail": 0, "latency": None, "streak": 0, "open_until": 0.0}
+                      for b in self.backends}
+
+    def _order(self):
+        now = time.time()
+        with self.lock:
+            ready = [b for b in self.backends if self.stats[b]["open_until"] <= now]
+            return ready or [min(self.backends, key=lambda b: self.stats[b]["open_until"])]
+
+    def run(self, detect):
+        """Returns (detect(backend), backend) for the first backend that doesn't raise"""
+        for backend in self._order():
+            t0 = time.perf_counter()
+            try:
+                result = detect(backend)
+            except Exception:
+                self._record(backend, False, time.perf_counter() - t0)
+                continue
+            self._record(backend, True, time.perf_counter() - t0)
+            return result, backend
+        return None, None
+
+    def _record(self, backend, ok, seconds):
+        with self.lock:
+            st = self.stats[backend]
+            st["calls"] += 1
+            if ok:
+                st["ok"] += 1
+                st["streak"] = 0
+                st["latency"] = seconds if st["latency"] is None else 0.8 * st["latency"] + 0.2 * seconds
+            else:
+                st["fail"] += 1
+                st["streak"] += 1
+                if st["streak"] >= self.max_failures:
+                    st["open_until"] = time.time() + self.cooldown
+
+    def summary(self):
+        """One line per backend: success rate, mean latency, breaker state"""
+        now = time.time()
+        lines = []
+        with self.lock:
+            for b in self.backends:
+                st = self.stats[b]
+                rate = f"{st['ok'] / st['calls']:.0%}" if st["calls"] else "--"
+                lat = f"{st['latency'] * 1000:.0f} ms" if st["latency"] else "--"
+                state = f"OPEN {st['open_until'] - now:.0f}s" if st["open_until"] > now else "closed"
+                lines.append(f"{b:<11} {st['calls']:>5} calls  ok {rate:>4}  {lat:>7}  breaker {state}")
+        return "\n".join(lines)
+
+class InferenceEngine(ABC):
+    """Detect / classify interface behind EmotionPipeline, EmotionBatcher and warm-up.
+
+    One engine instance is shared by every stream and worker thread, so
+    implementations must be thread-safe. Scores are percentages keyed by the
+    labels in EMOTION_LABELS.
+    """
+    name = "base"
+    detectors = ()                      # Detector names accepted by detect(), best first
+    cache_tag = ""                      # Keeps EmotionCache results of different models apart
+
+    @abstractmethod
+    def warm_up(self, detectors=()):
+        """Load the models and run a dummy pass; returns the elapsed seconds"""
+
+    @abstractmethod
+    def detect(self, frame, detector):
+        """Face boxes (x, y, w, h) found by `detector`, largest first"""
+
+    @abstractmethod
+    def prepare(self, face):
+        """BGR crop -> one model input row; cheap, runs on the caller's thread"""
+
+    @abstractmethod
+    def predict(self, rows):
+        """prepare() rows -> [(dominant_emotion, scores)], one model call"""
+
+    def _warm(self, detectors, warm_detector=None):
+        """Shared warm_up body: emotion model, then each detector (default: detect()) on a dummy frame"""
+        t0 = time.perf_counter()
+        dummy = np.zeros((224, 224, 3), dtype=np.uint8)
+        self.classify(dummy)            # A missing emotion model should fail loudly here
+        for detector in detectors:
+            try:
+                (warm_detector or self.detect)(dummy, detector)
+            except Exception:
+                pass  # A broken detector is handled by the cascade at analysis time
+        return time.perf_counter() - t0
+
+    def classify_batch(self, faces):
+        return self.predict([self.prepare(face) for face in faces])
+
+    def classify(self, face):
+        return self.classify_batch([face])[0]
+
+    def analyze(self, frame, detector):
+        """(emotion, rect or None, scores) for the largest face; the whole frame is classified when none is found"""
+        faces = self.detect(frame, detector)
+        rect = faces[0] if faces else None
+        emo, scores = self.classify(crop_face(frame, rect) if rect else frame)
+        return emo, rect, scores
+
+    @staticmethod
+    def _scores(values, labels=EMOTION_LABELS):
+        """Model output row -> (dominant, {label: percent}); logits are softmaxed, unknown labels dropped"""
+        p = np.asarray(values, dtype=np.float64).ravel()
+        if p.min() < 0 or abs(p.sum() - 1.0) > 0.01:
+            p = np.exp(p - p.max())
+        pairs = [(label, v) for label, v in zip(labels, p) if label in EMOTION_LABELS]
+        total = float(sum(v for _, v in pairs)) or 1.0
+        scores = {label: float(v) * 100.0 / total for label, v in pairs}
+        return max(scores, key=scores.get), scores
+
+class DeepFaceEngine(InferenceEngine):
+    """Default engine: DeepFace's detector backends and its Keras emotion model.
+
+    `threads` caps TensorFlow's intra/inter-op pools; it only takes effect if
+    set before TensorFlow starts executing.
+    """
+    name = "deepface"
+    detectors = tuple(DETECTOR_CASCADE)
+
+    def __init__(self, threads=None):
+        self.threads = threads
+        self.model = None
+        self.lock = threading.Lock()
+
+    def _model(self):
+        with self.lock:
+            if self.model is None:
+                if self.threads:
+                    try:
+                        import tensorflow as tf
+                        tf.config.threading.set_intra_op_parallelism_threads(self.threads)
+                        tf.config.threading.set_inter_op_parallelism_threads(self.threads)
+                    except (ImportError, RuntimeError):
+                        pass  # RuntimeError: TensorFlow was already initialised
+                self.model = DeepFace.build_model("Emotion")
+            return self.model
+
+    def warm_up(self, detectors=()):
+        # DeepFace keeps built models in module-level caches, so this moves the
+        # multi-second load (and graph tracing) off the first scan; analyze()
+        # builds and caches the detector on first use
+        return self._warm(detectors, lambda frame, backend: DeepFace.analyze(
+            frame, actions=['emotion'], enforce_detection=False, detector_backend=backend, silent=True))
+
+    def detect(self, frame, detector):
+        h, w = frame.shape[:2]
+        boxes = []
+        for face in DeepFace.extract_faces(frame, detector_backend=detector, enforce_detection=False):
+            a = face["facial_area"]
+            # No face found: DeepFace falls back to the whole frame
+            if a["w"] >= w - 1 and a["h"] >= h - 1: continue
+            boxes.append((a["x"], a["y"], a["w"], a["h"]))
+        return sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+
+    def prepare(self, face):
+        return emotion_input(face)
+
+    def predict(self, rows):
+        preds = self._model().predict_on_batch(np.stack(rows)[..., None])
+        return [self._scores(p) for p in np.asarray(preds)]
+
+    def analyze(self, frame, detector):
+        # One DeepFace call detects and classifies, with DeepFace's own alignment
+        res = DeepFace.analyze(
+            frame,
+            actions=['emotion'],
+            enforce_detection=False,  # Allow graceful handling when no face detected
+            detector_backend=detector,
+            silent=True
+        )[0]
+        r = res['region']
+        scores = {k: float(v) for k, v in res['emotion'].items()}  # DeepFace returns np.float32
+        if r['w'] >= frame.shape[1] - 1 and r['h'] >= frame.shape[0] - 1:
+            # No face found: DeepFace fell back to the whole frame
+            return res['dominant_emotion'], None, scores
+        return res['dominant_emotion'], (int(r['x']), int(r['y']), int(r['w']), int(r['h'])), scores
+
+# Local model files for OpenCVDnnEngine, relative to "dir"
+DNN_MODELS = {
+    "dir": "models",
+    "yunet": "face_detection_yunet_2023mar.onnx",
+    "ssd_config": "deploy.prototxt",
+    "ssd_weights": "res10_300x300_ssd_iter_140000.caffemodel",
+    "emotion": "emotion.onnx",          # DeepFace's emotion model exported to ONNX
+    "emotion_size": 48,
+    "emotion_layout": "nhwc",           # "nchw" for FER+-style models
+    "emotion_scale": 1.0,               # Input range multiplier ([0, 1] -> 255.0 for FER+)
+    "emotion_labels": EMOTION_LABELS,   # Output order; labels outside EMOTION_LABELS are dropped
+    "min_confidence": 0.6,
+}
+
+class OpenCVDnnEngine(InferenceEngine):
+    """CPU engine on cv2.dnn, no TensorFlow needed.
+
+    Faces come from YuNet (cv2.FaceDetectorYN) or the res10 SSD Caffe model,
+    emotions from an ONNX classifier; all are read from local files named in
+    DNN_MODELS. OpenCV nets are not thread-safe, so each model has its own
+    lock, and `threads` caps OpenCV's worker pool.
+    """
+    name = "opencv-dnn"
+    detectors = ("yunet", "ssd")
+    cache_tag = ":opencv-dnn"
+
+    def __init__(self, threads=None, **models):
+        self.config = dict(DNN_MODELS, **{k: v for k, v in models.items() if v is not None})
+        self.threads = threads
+        self.nets = {}
+        self.locks = {name: threading.Lock() for name in ("yunet", "ssd", "emotion")}
+
+    def _path(self, key):
+        path = os.path.join(self.config["dir"], self.config[key])
+        if not os.path.exists(path): raise FileNotFoundError(f"Model file not found: {path}")
+        return path
+
+    def _net(self, name):
+        """Load on first use; call with self.locks[name] held"""
+        if name in self.nets: return self.nets[name]
+        if self.threads: cv2.setNumThreads(self.threads)
+        if name == "yunet":
+            net = cv2.FaceDetectorYN.create(self._path("yunet"), "", (320, 320), self.config["min_confidence"], 0.3, 50)
+        else:
+            net = cv2.dnn.readNetFromCaffe(self._path("ssd_config"), self._path("ssd_weights")) if name == "ssd" \
+                else cv2.dnn.readNetFromONNX(self._path("emotion"))
+            net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.nets[name] = net
+        return net
+
+    def warm_up(self, detectors=()):
+        return self._warm(detectors)
+
+    def detect(self, frame, detector):
+        h, w = frame.shape[:2]
+        if detector == "yunet":
+            with self.locks["yunet"]:
+                net = self._net("yunet")
+                net.setInputSize((w, h))
+                _, found = net.detect(frame)
+            boxes = [] if found is None else [tuple(int(v) for v in f[:4]) for f in found]
+        elif detector == "ssd":
+            blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+            with self.locks["ssd"]:
+                net = self._net("ssd")
+                net.setInput(blob)
+                out = net.forward()
+            boxes = []
+            for det in out[0, 0]:
+                if det[2] < self.config["min_confidence"]: continue
+                x1, y1, x2, y2 = (det[3:7] * [w, h, w, h]).astype(int)
+                x1, y1 = max(x1, 0), max(y1, 0)
+                boxes.append((int(x1), int(y1), int(min(x2, w) - x1), int(min(y2, h) - y1)))
+        else:
+            raise ValueError(f"Unknown detector for {self.name}: {detector}")
+        boxes = [b for b in boxes if b[2] > 0 and b[3] > 0]
+        return sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+
+    def prepare(self, face):
+        x = emotion_input(face, self.config["emotion_size"]) * self.config["emotion_scale"]
+        return x[..., None] if self.config["emotion_layout"] == "nhwc" else x[None]
+
+    def predict(self, rows):
+        with self.locks["emotion"]:
+            net = self._net("emotion")
+            net.setInput(np.stack(rows).astype(np.float32))
+            out = net.forward()
+        return [self._scores(row, self.config["emotion_labels"]) for row in out.reshape(len(rows), -1)]
+
+# Reduced-precision TFLite copies of DeepFace's emotion model, written by convert_emotion_model()
+QUANTIZED_MODELS = {"dir": "models", "float16": "emotion_float16.tflite", "int8": "emotion_int8.tflite"}
+EMOTION_MODELS = ["float32"] + [p for p in QUANTIZED_MODELS if p != "dir"]
+
+class QuantizedEmotionEngine(InferenceEngine):
+    """A base engine's face detectors in front of a reduced-precision TFLite emotion model.
+
+    The TFLite interpreter (tflite_runtime if installed, else TensorFlow's)
+    runs on CPU with XNNPACK; it is not thread-safe, so calls share one lock
+    and batches resize the input tensor only when their size changes.
+    Quantized inputs/outputs are (de)quantized here, float ones passed as is.
+    """
+    def __init__(self, base, precision, threads=None, model_dir=None):
+        self.base = base
+        self.precision = precision
+        self.path = os.path.join(model_dir or QUANTIZED_MODELS["dir"], QUANTIZED_MODELS[precision])
+        self.threads = threads
+        self.name = f"{base.name}+{precision}"
+        self.cache_tag = f":{self.name}"
+        self.detectors = base.detectors
+        self.interpreter = None
+        self.batch = 0
+        self.lock = threading.Lock()
+
+    def _interpreter(self):
+        """Load on first use; call with self.lock held"""
+        if self.interpreter is None:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"Quantized model not found: {self.path} (create it with --quantize {self.precision})")
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+            self.interpreter = Interpreter(model_path=self.path, num_threads=self.threads or os.cpu_count())
+        return self.interpreter
+
+    def warm_up(self, detectors=()):
+        # Not base.warm_up(): that would also load the base engine's float emotion model
+        return self._warm(detectors)
+
+    def detect(self, frame, detector):
+        return self.base.detect(frame, detector)
+
+    def prepare(self, face):
+        return emotion_input(face)[..., None]
+
+    def predict(self, rows):
+        x = np.stack(rows).astype(np.float32)
+        with self.lock:
+            it = self._interpreter()
+            if self.batch != len(rows):
+                it.resize_tensor_input(it.get_input_details()[0]["index"], list(x.shape))
+                it.allocate_tensors()
+                self.batch = len(rows)
+            inp, out = it.get_input_details()[0], it.get_output_details()[0]
+            if inp["dtype"] != np.float32:
+                scale, zero = inp["quantization"]
+                info = np.iinfo(inp["dtype"])
+                x = np.clip(np.round(x / scale + zero), info.min, info.max).astype(inp["dtype"])
+            it.set_tensor(inp["index"], x)
+            it.invoke()
+            y = it.get_tensor(out["index"])
+        if out["dtype"] != np.float32:
+            scale, zero = out["quantization"]
+            y = (y.astype(np.float32) - zero) * scale
+        return [self._scores(row) for row in y]
+
+INFERENCE_ENGINES = {"deepface": DeepFaceEngine, "opencv-dnn": OpenCVDnnEngine}
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(settings=None):
+    """Shared engine for `settings` (default ENGINE_SETTINGS); models load once per process"""
+    st = dict(ENGINE_SETTINGS, **(settings or {}))
+    key = (st["engine"], st["threads"], st["model_dir"], st["emotion_model"])
+    with _engines_lock:
+        if key not in _engines:
+            cls = INFERENCE_ENGINES[st["engine"]]
+            engine = cls(threads=st["threads"], dir=st["model_dir"]) if cls is OpenCVDnnEngine \
+                else cls(threads=st["threads"])
+            if st["emotion_model"] != "float32":
+                engine = QuantizedEmotionEngine(engine, st["emotion_model"], st["threads"], st["model_dir"])
+            _engines[key] = engine
+        return _engines[key]
+
+class EmotionCache:
+    """LRU cache of emotion results keyed by a dead-zone difference hash of the image, with an optional SQLite layer"""
+    def __init__(self, capacity=4096, hash_size=16, dead_zone=4, disk_path=None, min_edges=0.1):
+        self.capacity = capacity
+        self.hash_size = hash_size
+        self.dead_zone = dead_zone
+        self.min_edges = min_edges
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0, "disk_errors": 0}
+        self.conn = None
+        if disk_path:
+            # Autocommit: no implicit transaction keeps the WAL write lock between puts
+            self.conn = sqlite3.connect(disk_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS emotion_cache (key BLOB PRIMARY KEY, value TEXT NOT NULL)")
+
+    def key(self, image, kind="C", hash_size=None):
+        """`kind` separates namespaces, e.g. crop classifications vs full-frame analyses; None if too flat to cache"""
+        size = hash_size or self.hash_size
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+        steps = small[:, 1:] - small[:, :-1]
+        up, down = steps > self.dead_zone, steps < -self.dead_zone
+        if np.count_nonzero(up) + np.count_nonzero(down) < self.min_edges * steps.size:
+            with self.lock: self.stats["uncacheable"] += 1
+            return None
+        return kind.encode() + np.packbits(up).tobytes() + np.packbits(down).tobytes()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            if self.conn is not None:
+                try:
+                    row = self.conn.execute("SELECT value FROM emotion_cache WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+                    self.stats["disk_errors"] += 1
+                if row:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.stats["disk_hits"] += 1
+                    return value
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self._remember(key, value)
+            if self.conn is not None:
+                try:
+                    self.conn.execute("INSERT OR REPLACE INTO emotion_cache VALUES (?, ?)",
+                                      (key, json.dumps(value, default=float)))
+                except sqlite3.Error:
+                    self.stats["disk_errors"] += 1  # e.g. still locked after the timeout: keep it in memory only
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def hit_rate(self):
+        st = self.stats
+        hits = st["hits"] + st["disk_hits"]
+        return hits / (hits + st["misses"]) if hits + st["misses"] else 0.0
+
+    def summary(self):
+        return f"cache {self.hit_rate():.0%} hit ({len(self.entries)}/{self.capacity})"
+
+    def close(self):
+        if self.conn is None: return
+        with self.lock:
+            self.conn.close()
+            self.conn = None
+
+class EmotionPipeline:
+    """Face detection/tracking + emotion classification, independent of the UI.
+
+    Shared by the live app (on its inference worker) and the headless batch
+    mode, so both produce results through the exact same code path.
+    """
+    def __init__(self, tracker=None, batcher=None, cascade=None, cache=None, cache_frames=False, engine=None):
+        self.engine = engine or get_engine()
+        self.tracker = tracker or FaceTracker()
+        self.batcher = batcher          # Optional EmotionBatcher shared across streams
+        self.cascade = cascade or DetectorCascade()
+        self.cache = cache              # Optional EmotionCache in front of classification
+        self.cache_frames = cache_frames  # Also cache full detections (replays/rescoring, not live)
+
+    def track(self, frame):
+        """Per-frame tracking step; returns (face_rect, rect_to_analyse)"""
+        rect = self.tracker.update(frame)
+        return rect, (None if self.tracker.needs_detection() else rect)
+
+    def analyze(self, frame, rect=None):
+        """Returns (emotion, region, scores) or None; `rect` skips detection for a tracked face"""
+        result = self.classify(frame, rect)
+        self.update_track(frame, rect, result)
+        return result
+
+    def update_track(self, frame, rect, result):
+        """Re-seed the tracker from a full-detection result"""
+        if result is None or result[1] is None: self.tracker.reset()
+        elif result[1] != rect: self.tracker.init(frame, result[1])
+
+    def classify(self, frame, rect=None):
+        """Stateless part of analyze(); safe to run in another process"""
+        if rect is not None:
+            # Tracked face: classify the crop only, skipping detection
+            t0 = time.perf_counter()
+            try:
+                crop = crop_face(frame, rect)
+                key = self.cache.key(crop, "C" + self.engine.cache_tag) if self.cache else None
+                hit = self.cache.get(key) if key else None
+                if hit:
+                    return hit[0], rect, hit[1]
+                emo, scores = (self.batcher or self.engine).classify(crop)
+                METRICS.record("emotion.crop", time.perf_counter() - t0)
+                if key: self.cache.put(key, (emo, scores))
+                return emo, rect, scores
+            except Exception:
+                pass
+        # Whole frames get a finer hash: a face moving a little must not reuse an old region
+        key = self.cache.key(frame, "F" + self.engine.cache_tag, 2 * self.cache.hash_size) \
+            if self.cache and self.cache_frames else None
+        hit = self.cache.get(key) if key else None
+        if hit:
+            emo, region, scores = hit
+            return emo, tuple(int(v) for v in region) if region else None, scores
+        result = self._detect(frame)
+        if key and result: self.cache.put(key, result)
+        return result
+
+    def _detect(self, frame):
+        # Full detection through the backend cascade (RetinaFace first by default)
+        t0 = time.perf_counter()
+        result, backend = self.cascade.run(lambda backend: self.engine.analyze(frame, backend))
+        METRICS.record(f"detect.{backend or 'none'}", time.perf_counter() - t0)
+        return result
+
+CAPTURE_DEFAULTS = {"width": 1280, "height": 720, "fps": 30, "fourcc": "MJPG", "buffer_size": 1}
+
+class FramePool:
+    """Preallocated capture buffers with reference-counted slots.
+
+    The grabber decodes straight into a free slot and every stage gets a
+    read-only view of it instead of a private copy. A slot is only rewritten
+    once all holders have released it; when every slot is held the grabber
+    falls back to a fresh allocation, counted in `stats["fallback"]`.
+    """
+    def __init__(self, slots=6):
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.buffers = []
+        self.refs = []
+        self.index = {}                 # buffer address -> slot
+        self.shape = None
+        self.stats = {"frames": 0, "fallback": 0, "allocated_bytes": 0, "pool_bytes": 0}
+        self.started = time.time()
+
+    def _allocate(self, shape):
+        # Buffers of an old shape stay alive through any views still held
+        self.buffers = [np.empty(shape, np.uint8) for _ in range(self.slots)]
+        self.refs = [0] * self.slots
+        self.index = {b.ctypes.data: i for i, b in enumerate(self.buffers)}
+        self.shape = shape
+        self.stats["pool_bytes"] += self.slots * self.buffers[0].nbytes
+
+    def reshape(self, shape):
+        with self.lock:
+            if shape != self.shape: self._allocate(shape)
+
+    def acquire(self):
+        """A free writable buffer held once by the caller, or None (no shape yet / all slots busy)"""
+        with self.lock:
+            if self.shape is None: return None
+            self.stats["frames"] += 1
+            for slot, refs in enumerate(self.refs):
+                if refs == 0:
+                    self.refs[slot] = 1
+                    return self.buffers[slot]
+            self.stats["fallback"] += 1
+            return None
+
+    def count_allocation(self, frame):
+        with self.lock: self.stats["allocated_bytes"] += frame.nbytes
+
+    def retain(self, frame):
+        with self.lock:
+            slot = self.index.get(frame.ctypes.data)
+            if slot is not None: self.refs[slot] += 1
+        return frame
+
+    def release(self, frame):
+        if frame is None: return
+        with self.lock:
+            slot = self.index.get(frame.ctypes.data)
+            if slot is not None and self.refs[slot] > 0: self.refs[slot] -= 1
+
+    def in_use(self):
+        with self.lock: return sum(1 for r in self.refs if r)
+
+    def alloc_rate(self):
+        """Bytes/s of per-frame allocations outside the pool since it was created"""
+        elapsed = time.time() - self.started
+        return self.stats["allocated_bytes"] / elapsed if elapsed > 0 else 0.0
+
+class FrameGrabber:
+    """Dedicated capture thread that always holds the newest frame.
+
+    Reading continuously drains the driver buffer, so consumers never work on
+    a frame that sat in the queue; frames overwritten before anyone picked
+    them up are counted as skipped. Camera sources get the requested
+    width/height/FPS/FOURCC/buffer size; file sources are paced at their FPS.
+    Frames are decoded into a FramePool and handed out as read-only views:
+    latest() retains the frame for the caller, who must release() it.
+    """
+    def __init__(self, source, settings=None):
+        self.source = source
+        self.settings = dict(CAPTURE_DEFAULTS, **(settings or {}))
+        self.pool = FramePool()
+        self.cond = threading.Condition()
+        self.cap = None
+        self.frame = None
+        self.ts = 0.0                   # time.time() when the frame was read
+        self.seq = 0
+        self.consumed_seq = 0
+        self.alive = False
+        self.pace = 0.0
+        self.skipped = 0
+        self.times = deque(maxlen=60)
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened(): return False
+        if isinstance(self.source, int):
+            self._configure()
+        else:
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self.pace = 1.0 / fps if fps and fps > 0 else 0.0
+        return True
+
+    def _configure(self):
+        st = self.settings
+        # FOURCC first: many drivers only offer high resolutions in MJPEG
+        if st.get("fourcc"): self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*st["fourcc"]))
+        if st.get("width"): self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, st["width"])
+        if st.get("height"): self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, st["height"])
+        if st.get("fps"): self.cap.set(cv2.CAP_PROP_FPS, st["fps"])
+        if st.get("buffer_size"): self.cap.set(cv2.CAP_PROP_BUFFERSIZE, st["buffer_size"])
+
+    def actual(self):
+        """What the driver actually agreed to"""
+        return {"width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "fps": self.cap.get(cv2.CAP_PROP_FPS)}
+
+    def start(self):
+        self.alive = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.alive = False
+            self.cond.notify_all()
+        if self.cap is None: return
+        if getattr(self, "thread", None): self.thread.join(timeout=1.0)
+        self.cap.release()
+
+    def _read(self):
+        """Decode the next frame into a pool slot; returns a read-only view or None"""
+        buf = self.pool.acquire()
+        ret, frame = self.cap.read(buf) if buf is not None else self.cap.read()
+        if not ret:
+            self.pool.release(buf)
+            return None
+        if frame is not buf:
+            # First frame, busy pool or a size change: OpenCV allocated a new array
+            self.pool.release(buf)
+            self.pool.count_allocation(frame)
+            self.pool.reshape(frame.shape)
+        view = frame.view()
+        view.flags.writeable = False
+        return view
+
+    def _run(self):
+        next_t = time.perf_counter()
+        while self.alive:
+            t0 = time.perf_counter()
+            frame = self._read()
+            if frame is None: break
+            METRICS.record("capture.read", time.perf_counter() - t0)
+            now = time.time()
+            with self.cond:
+                if self.seq > self.consumed_seq: self.skipped += 1
+                # The grabber's own hold moves from the previous frame to this one
+                self.pool.release(self.frame)
+                self.frame, self.ts = frame, now
+                self.seq += 1
+                self.times.append(now)
+                self.cond.notify_all()
+            if self.pace:
+                next_t += self.pace
+                time.sleep(max(0.0, next_t - time.perf_counter()))
+        with self.cond:
+            self.alive = False
+            self.cond.notify_all()
+
+    def latest(self, after_seq, timeout=1.0):
+        """Newest (frame, ts, seq) newer than `after_seq`, or None on timeout/end"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after_seq or not self.alive, timeout)
+            if self.seq <= after_seq: return None
+            self.consumed_seq = self.seq
+            return self.pool.retain(self.frame), self.ts, self.seq
+
+    def release(self, frame):
+        self.pool.release(frame)
+
+    def fps(self):
+        if len(self.times) < 2: return 0.0
+        span = self.times[-1] - self.times[0]
+        return (len(self.times) - 1) / span if span > 0 else 0.0
+
+class FrameRing:
+    """Fixed-memory ring of recent, downscaled frames for event clips.
+
+    Slots are allocated once and frames are resized straight into them at up
+    to `fps`, so memory stays at capacity * w * h * 3 bytes however long the
+    session runs.
+    """
+    def __init__(self, seconds=6.0, fps=15, size=(426, 240)):
+        self.fps = fps
+        self.size = size
+        self.capacity = int(seconds * fps)
+        self.frames = np.zeros((self.capacity, size[1], size[0], 3), np.uint8)
+        self.stamps = np.full(self.capacity, -np.inf)
+        self.head = 0
+        self.last = 0.0
+        self.lock = threading.Lock()
+
+    def push(self, frame, ts):
+        if ts - self.last < 1.0 / self.fps: return
+        self.last = ts
+        with self.lock:
+            cv2.resize(frame, self.size, dst=self.frames[self.head], interpolation=cv2.INTER_AREA)
+            self.stamps[self.head] = ts
+            self.head = (self.head + 1) % self.capacity
+
+    def window(self, start, end):
+        """Copies of the frames captured in [start, end], oldest first"""
+        with self.lock:
+            order = [(self.head + i) % self.capacity for i in range(self.capacity)]
+            return [self.frames[i].copy() for i in order if start <= self.stamps[i] <= end]
+
+class CameraStream:
+    """One capture source with its own tracker, gate, scheduler, smoother and history.
+
+    Streams only hold per-camera state; the models live once in the shared
+    inference worker, so memory grows per stream rather than per model copy.
+    """
+    def __init__(self, key, source, cpu_budget=0.5, batcher=None, capture=None, cascade=None, cache=None):
+        self.key = key
+        self.source = source
+        self.name = f"CAM {source}" if isinstance(source, int) else os.path.basename(str(source))
+        self.grabber = FrameGrabber(source, capture)
+        self.frame = None
+        self.result_latency = None      # EMA of capture -> result, seconds
+        self.face_rect = None
+        self.emotion = None             # Latest smoothed label, drawn on the tile
+        self.tile = None
+        self.renderer = None
+        self.smoother = EmotionSmoother()
+        self.history = deque(maxlen=500)
+        self.pipeline = EmotionPipeline(batcher=batcher, cascade=cascade, cache=cache)
+        self.gate = FrameChangeGate()
+        self.scheduler = AnalysisScheduler(cpu_budget=cpu_budget)
+        self.last_result = None
+        self.ring = FrameRing()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def parse_sources(text):
+        """'0, 1, clip.mp4' -> [0, 1, 'clip.mp4']"""
+        sources = []
+        for part in text.split(","):
+            part = part.strip()
+            if part: sources.append(int(part) if part.isdigit() else part)
+        return sources or [0]
+
+    def open(self):
+        if not self.grabber.open(): return False
+        self.grabber.start()
+        return True
+
+    def release(self):
+        self.grabber.stop()
+
+    def record_result_latency(self, ts):
+        seconds = time.time() - ts
+        self.result_latency = seconds if self.result_latency is None else 0.8 * self.result_latency + 0.2 * seconds
+
+class PreviewRenderer:
+    """Low-overhead preview path for one tile.
+
+    The capture thread downsizes with OpenCV before any colour conversion and
+    parks the result as the single pending frame; at most one Tk redraw is
+    queued at a time and it pastes into one reused PhotoImage. Frames that
+    arrive above `max_fps` or replace an undrawn frame are counted as dropped.
+    """
+    def __init__(self, master, label, size, max_fps=30):
+        self.master = master
+        self.label = label
+        self.size = size
+        self.min_interval = 1.0 / max_fps
+        self.lock = threading.Lock()
+        self.pending = None
+        self.scheduled = False
+        self.photo = None
+        self.scratch = None             # Reused resize/mirror buffers (capture thread only)
+        self.last_submit = 0.0
+        self.rendered = 0
+        self.dropped = 0
+        self.latency = None             # EMA of capture -> display, seconds
+
+    def submit(self, frame, rect=None, text=None, ts=None, overlay=None):
+        """Capture-thread side: scale, annotate and park the newest frame"""
+        now = time.perf_counter()
+        if now - self.last_submit < self.min_interval:
+            self.dropped += 1
+            return
+        self.last_submit = now
+        rgb = self.prepare(frame, rect, text, overlay)
+        METRICS.record("preview.convert", time.perf_counter() - now)
+        with self.lock:
+            if self.pending is not None: self.dropped += 1
+            self.pending = (rgb, ts or time.time())
+            if self.scheduled: return
+            self.scheduled = True
+        self.master.after(0, self._draw)
+
+    def prepare(self, frame, rect=None, text=None, overlay=None):
+        """Downsize, annotate, mirror and convert to RGB; no Tk involved"""
+        h, w = frame.shape[:2]
+        if self.scratch is None:
+            self.scratch = (np.empty((self.size[1], self.size[0], 3), np.uint8),
+                            np.empty((self.size[1], self.size[0], 3), np.uint8))
+        small = cv2.resize(frame, self.size, dst=self.scratch[0], interpolation=cv2.INTER_AREA)
+        if rect:
+            sx, sy = self.size[0] / w, self.size[1] / h
+            x, y, rw, rh = rect
+            # Aurora-styled face rectangle
+            cv2.rectangle(small, (int(x * sx), int(y * sy)), (int((x + rw) * sx), int((y + rh) * sy)),
+                          (255, 0, 230), 2)  # Purple/Pink color
+        small = cv2.flip(small, 1, dst=self.scratch[1])
+        if text:
+            cv2.putText(small, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 230), 2)
+        for i, line in enumerate(reversed(overlay or ())):
+            cv2.putText(small, line, (6, self.size[1] - 8 - 13 * i), cv2.FONT_HERSHEY_PLAIN, 0.8, (0, 255, 200), 1)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+    def _draw(self):
+        """Tk-thread side: paste the pending frame into the reused PhotoImage"""
+        with self.lock:
+            pending, self.pending, self.scheduled = self.pending, None, False
+        if pending is None or not self.label.winfo_exists(): return
+        rgb, ts = pending
+        t0 = time.perf_counter()
+        img = Image.fromarray(rgb)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(img)
+            self.label.configure(image=self.photo)
+            self.label.image = self.photo
+        else:
+            self.photo.paste(img)
+        METRICS.record("preview.paste", time.perf_counter() - t0)
+        self.rendered += 1
+        seconds = time.time() - ts
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+class SessionStore:
+    """Append-only SQLite log of every result, written in batches from a background thread"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY, started REAL NOT NULL, ended REAL, sources TEXT);
+        CREATE TABLE IF NOT EXISTS records (
+            session TEXT NOT NULL, seq INTEGER NOT NULL, ts REAL NOT NULL,
+            source TEXT, emotion TEXT NOT NULL, raw TEXT, confidence REAL, scores TEXT,
+            x INTEGER, y INTEGER, w INTEGER, h INTEGER, comment TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (session, seq));
+        CREATE INDEX IF NOT EXISTS idx_records_ts ON records (session, ts);
+        CREATE INDEX IF NOT EXISTS idx_records_emotion ON records (session, emotion, ts);
+        CREATE INDEX IF NOT EXISTS idx_records_time ON records (ts);
+    """
+
+    def __init__(self, path="emotion_sessions.db", batch_size=200, flush_interval=1.0, on_error=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.session = None
+        self.seq = 0
+        self.written = 0
+        self.failed = 0                 # Rows lost to write errors
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start_session(self, sources):
+        with self.lock:
+            self.session = f"{datetime.now():%Y%m%d-%H%M%S-%f}"
+            self.seq = 0
+        self.queue.put(("INSERT OR IGNORE INTO sessions (id, started, sources) VALUES (?, ?, ?)",
+                        (self.session, time.time(), json.dumps(sources))))
+        return self.session
+
+    def end_session(self):
+        if self.session:
+            self.queue.put(("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), self.session)))
+
+    def append(self, emotion, ts=None, source="", raw=None, confidence=None, scores=None, rect=None):
+        """Queue one result (`ts`: capture time, epoch seconds); returns its seq within the current session"""
+        with self.lock:
+            if self.session is None: return None
+            self.seq += 1
+            seq, session = self.seq, self.session
+        x, y, w, h = rect or (None, None, None, None)
+        self.queue.put(("INSERT INTO records (session, seq, ts, source, emotion, raw, confidence, scores, "
+                        "x, y, w, h) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (session, seq, ts or time.time(), source, emotion, raw, confidence,
+                         json.dumps(scores, default=float) if scores else None, x, y, w, h)))
+        return seq
+
+    @staticmethod
+    def _filters(session=None, start=None, end=None, emotions=None):
+        clauses, params = [], []
+        if session: clauses.append("session = ?"); params.append(session)
+        if start is not None: clauses.append("ts >= ?"); params.append(start)
+        if end is not None: clauses.append("ts < ?"); params.append(end)
+        if emotions:
+            clauses.append(f"emotion IN ({', '.join('?' * len(emotions))})")
+            params.extend(emotions)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, **filters):
+        where, params = self._filters(**filters)
+        with closing(sqlite3.connect(self.path, timeout=10.0)) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM records{where}", params).fetchone()[0]
+
+    def iter_records(self, chunk=2000, **filters):
+        """Yields lists of row dicts in time order, `chunk` rows at a time, on its own connection"""
+        where, params = self._filters(**filters)
+        with closing(sqlite3.connect(self.path, timeout=10.0)) as conn:
+            conn.row_factory = sqlite3.Row
+            cur = conn.execute(f"SELECT * FROM records{where} ORDER BY ts, seq", params)
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows: break
+                yield [dict(r) for r in rows]
+
+    def set_comment(self, session, seq, comment):
+        self.queue.put(("UPDATE records SET comment = ? WHERE session = ? AND seq = ?", (comment, session, seq)))
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is committed"""
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        self.end_session()
+        self.flush()
+
+    def _run(self):
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        pending, waiters = [], []
+        last_flush = time.perf_counter()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                if isinstance(item, threading.Event): waiters.append(item)
+                else: pending.append(item)
+            except queue.Empty:
+                pass
+            due = time.perf_counter() - last_flush >= self.flush_interval
+            if pending and (len(pending) >= self.batch_size or due or waiters):
+                self._write(conn, pending)
+                pending = []
+            if due or waiters or not pending: last_flush = time.perf_counter()
+            for w in waiters: w.set()
+            waiters = []
+
+    def _write(self, conn, pending):
+        for attempt in (1, 2):
+            try:
+                with conn:  # One transaction per batch, rolled back on error
+                    for sql, params in pending: conn.execute(sql, params)
+                self.written += len(pending)
+                return
+            except sqlite3.Error as e:
+                if attempt == 1:
+                    time.sleep(0.2)  # Typically a lock held by an export or another process
+                    continue
+                self.failed += len(pending)
+                print(f"Session store write failed: {e}")
+                if self.on_error: self.on_error(e, len(pending))
+
+EXPORT_FORMATS = {"CSV": ".csv", "JSONL": ".jsonl", "Parquet": ".parquet", "Feather": ".feather"}
+COLUMNAR_FORMATS = ("Parquet", "Feather")   # Need pyarrow
+EXPORT_FIELDS = ["session", "seq", "time", "source", "emotion", "raw", "confidence",
+                 "x", "y", "w", "h", "comment"] + EMOTION_LABELS
+
+def available_export_formats():
+    """EXPORT_FORMATS names usable in this install; the columnar ones are hidden without pyarrow"""
+    from importlib.util import find_spec
+    if find_spec("pyarrow") is not None: return list(EXPORT_FORMATS)
+    return [f for f in EXPORT_FORMATS if f not in COLUMNAR_FORMATS]
+
+class SessionExporter:
+    """Streams filtered session history out of the store on a background thread.
+
+    Every format is written chunk by chunk as rows come off the cursor, so
+    memory stays bounded by `chunk`: CSV/JSONL line by line, Parquet as one
+    row group and Feather (Arrow IPC) as one record batch per chunk. Progress
+    and completion are reported through callbacks that run on the export
+    thread.
+    """
+    def __init__(self, store, chunk=2000):
+        self.store = store
+        self.chunk = chunk
+        self.busy = False
+
+    def start(self, path, fmt, on_progress, on_done, **filters):
+        if self.busy: return False
+        self.busy = True
+        threading.Thread(target=self._run, args=(path, fmt, on_progress, on_done, filters), daemon=True).start()
+        return True
+
+    @staticmethod
+    def _flatten(row):
+        scores = json.loads(row.pop("scores") or "{}")
+        row["time"] = datetime.fromtimestamp(row.pop("ts")).isoformat(timespec="milliseconds")
+        for label in EMOTION_LABELS: row[label] = scores.get(label)
+        return row
+
+    @staticmethod
+    def _schema(pa):
+        """Fixed column types, so every chunk (even an all-null one) matches"""
+        types = {"seq": pa.int64(), "confidence": pa.float64(),
+                 **{k: pa.int64() for k in ("x", "y", "w", "h")}, **{k: pa.float64() for k in EMOTION_LABELS}}
+        return pa.schema([(name, types.get(name, pa.string())) for name in EXPORT_FIELDS])
+
+    def _run(self, path, fmt, on_progress, on_done, filters):
+        written = 0
+        try:
+            self.store.flush()
+            total = self.store.count(**filters)
+            chunks = self.store.iter_records(self.chunk, **filters)
+            if fmt in COLUMNAR_FORMATS:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                schema = self._schema(pa)
+                writer = pq.ParquetWriter(path, schema) if fmt == "Parquet" else pa.ipc.new_file(path, schema)
+                with writer:
+                    for rows in chunks:
+                        table = pa.Table.from_pylist([self._flatten(r) for r in rows], schema=schema)
+                        if fmt == "Parquet": writer.write_table(table)
+                        else: writer.write(table)
+                        written += len(rows)
+                        on_progress(written, total)
+            else:
+                with open(path, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS) if fmt == "CSV" else None
+                    if writer: writer.writeheader()
+                    for rows in chunks:
+                        for r in rows:
+                            r = self._flatten(r)
+                            if writer: writer.writerow(r)
+                            else: f.write(json.dumps(r) + "\n")
+                        written += len(rows)
+                        on_progress(written, total)
+            on_done(path, written, None)
+        except Exception as e:
+            on_done(path, written, e)
+        finally:
+            self.busy = False
+
+class MediaWriter:
+    """Background writer for snapshots and event clips.
+
+    Encoding and disk I/O run on one thread behind a bounded queue, so the Tk
+    thread only pays for a frame copy; a full queue drops the job instead of
+    blocking. File names carry microseconds plus a running counter and never
+    collide. Clip jobs read their window out of a stream's FrameRing once the
+    post-event part has been captured.
+    """
+    def __init__(self, folder="captures", maxsize=32, jpeg_quality=92, pre=3.0, post=2.0, on_saved=None):
+        self.folder = folder
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self.jpeg_quality = jpeg_quality
+        self.pre, self.post = pre, post
+        self.on_saved = on_saved        # (path, error), called on the writer thread
+        self.counter = itertools.count(1)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _path(self, prefix, ext):
+        return os.path.join(self.folder, f"{prefix}_{datetime.now():%Y%m%d-%H%M%S-%f}_{next(self.counter)}.{ext}")
+
+    def _put(self, job):
+        try:
+            self.jobs.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def snapshot(self, frame, prefix="scan", fmt="jpg"):
+        """Queue an image; returns the path it will be written to, or None if dropped"""
+        path = self._path(prefix, fmt)
+        return path if self._put(("image", path, frame.copy())) else None
+
+    def clip(self, ring, event_ts, prefix="event"):
+        """Queue the [event - pre, event + post] window of `ring` as an MP4"""
+        path = self._path(prefix, "mp4")
+        return path if self._put(("clip", path, (ring, event_ts))) else None
+
+    def close(self, timeout=5.0):
+        try: self.jobs.put(None, timeout=timeout)
+        except queue.Full: return
+        self.thread.join(timeout)
+
+    def _write_image(self, path, frame):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality] if path.endswith(".jpg") else []
+        ok, buf = cv2.imencode(os.path.splitext(path)[1], frame, params)
+        if not ok: raise RuntimeError("encoding failed")
+        with open(path, "wb") as f: f.write(buf.tobytes())
+
+    def _write_clip(self, path, ring, event_ts):
+        frames = ring.window(event_ts - self.pre, event_ts + self.post)
+        if not frames: raise RuntimeError("no frames buffered around the event")
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), ring.fps, ring.size)
+        try:
+            for frame in frames: out.write(frame)
+        finally:
+            out.release()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None: return
+            kind, path, payload = job
+            error = None
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                if kind == "image": self._write_image(path, payload)
+                else: self._write_clip(path, *payload)
+            except Exception as e:
+                error = e
+            if self.on_saved: self.on_saved(path, error)
+
+class SpeechWorker:
+    """The only thread that touches the pyttsx3 engine.
+
+    Announcements go through a small bounded queue (oldest dropped when full).
+    Before speaking, the worker waits out `min_gap` since the last utterance
+    and keeps only the newest queued message; messages older than `max_age`
+    and repeats of what was said within `repeat_after` seconds are skipped.
+    """
+    def __init__(self, rate=140, maxsize=4, min_gap=2.0, max_age=3.0, repeat_after=10.0):
+        self.rate = rate
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self.min_gap = min_gap
+        self.max_age = max_age
+        self.repeat_after = repeat_after
+        self.engine = None
+        self.failed = False
+        self.last_text = None
+        self.last_spoken = 0.0
+        self.stats = {"queued": 0, "spoken": 0, "coalesced": 0, "stale": 0, "dropped": 0}
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while True:
+            try:
+                self.jobs.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.jobs.get_nowait()
+                    self.stats["dropped"] += 1
+                except queue.Empty: pass
+
+    def say(self, text):
+        if self.failed: return
+        self.stats["queued"] += 1
+        self._put((text, time.time()))
+
+    def stop(self, timeout=2.0):
+        self._put(None)
+        if self.thread: self.thread.join(timeout)
+
+    def _newest(self, item):
+        """Collapse everything waiting in the queue into its newest message"""
+        while True:
+            try: nxt = self.jobs.get_nowait()
+            except queue.Empty: return item
+            if nxt is None: return None
+            self.stats["coalesced"] += 1
+            item = nxt
+
+    def _run(self):
+        # The engine is created here and never used from any other thread
+        try:
+            self.engine = pyttsx3.init()
+            self.engine.setProperty('rate', self.rate)
+        except Exception:
+            self.failed = True
+            return
+        while True:
+            item = self.jobs.get()
+            if item is None: return
+            wait = self.last_spoken + self.min_gap - time.time()
+            if wait > 0: time.sleep(wait)
+            item = self._newest(item)
+            if item is None: return
+            text, ts = item
+            now = time.time()
+            if now - ts > self.max_age:
+                self.stats["stale"] += 1
+                continue
+            if text == self.last_text and now - self.last_spoken < self.repeat_after:
+                self.stats["coalesced"] += 1
+                continue
+            self.engine.say(text)
+            self.engine.runAndWait()
+            self.last_text, self.last_spoken = text, time.time()
+            self.stats["spoken"] += 1
+
+class HistoryView:
+    """Bounded window over the session log, backed by a ttk.Treeview.
+
+    Rows are queued by add() and inserted in one batch every `flush_ms`, and
+    only the newest `max_rows` stay in the widget (the full history lives in
+    the session store). Item ids are the record ids ("session:seq"), so
+    looking up the record behind a selected row is a dict access.
+    """
+    def __init__(self, master, tree, max_rows=200, flush_ms=250):
+        self.master = master
+        self.tree = tree
+        self.max_rows = max_rows
+        self.flush_ms = flush_ms
+        self.pending = []
+        self.records = {}               # item id -> record
+        self.scheduled = False
+        self.fallback_ids = 0
+
+    def add(self, record):
+        """Tk thread; the row appears on the next batch flush"""
+        self.pending.append(record)
+        if not self.scheduled:
+            self.scheduled = True
+            self.master.after(self.flush_ms, self._flush)
+
+    def _item_id(self, record):
+        if record.get("id") is not None: return f"{record['session']}:{record['id']}"
+        self.fallback_ids += 1
+        return f"local:{self.fallback_ids}"
+
+    def _flush(self):
+        self.scheduled = False
+        batch, self.pending = self.pending[-self.max_rows:], []
+        for record in batch:
+            iid = self._item_id(record)
+            self.records[iid] = record
+            self.tree.insert("", 0, iid=iid, tags=(record["emo"],),
+                             values=(record["time"], record["emo"].upper(), record["comment"], record["source"]))
+        overflow = self.tree.get_children()[self.max_rows:]
+        if overflow:
+            self.tree.delete(*overflow)
+            for iid in overflow: self.records.pop(iid, None)
+
+    def set_comment(self, iid, comment):
+        record = self.records.get(iid)
+        if record is None: return None
+        record["comment"] = comment
+        values = list(self.tree.item(iid, "values"))
+        values[2] = comment
+        self.tree.item(iid, values=values)
+        return record
+
+    def clear(self):
+        self.pending = []
+        self.records.clear()
+        self.tree.delete(*self.tree.get_children())
+
+def warm_up_models(detector_backends=None, engine=None):
+    """Load the engine's emotion model and its first two detectors ahead of the first scan.
+
+    Returns the elapsed time in seconds.
+    """
+    engine = engine or get_engine()
+    return engine.warm_up(detector_backends if detector_backends is not None else engine.detectors[:2])
+
 # =========================
 # MAIN APPLICATION (CustomTkinter Aurora Edition)
 # =========================
 
 class EmotionTrackerApp:
-    face_rect = None
-
     def __init__(self, master):
         self.master = master
         self.master.title("NEURAL MOOD PRO — AURORA EDITION")
@@ -184,22 +2165,39 @@ class EmotionTrackerApp:
         self.master.configure(fg_color=AURORA_THEME["bg_dark"])
         
         # Systems
-        self.cap = None
         self.running = False
-        self.frame = None
-        self.smoother = EmotionSmoother()
+        self.streams = []
+        self.tile_frame = None
+        self.tile_size = (530, 380)
         self.media_mgr = MediaCycleManager()
         self.history = deque(maxlen=500)
         self.current_emo_key = "neutral"
-        self.last_analysis = 0
+        self.batcher = EmotionBatcher()
+        self.cascade = DetectorCascade()
+        self.emotion_cache = EmotionCache()
+        self.store = SessionStore(on_error=self._on_store_error)
+        self.exporter = SessionExporter(self.store)
+        self.media = MediaWriter(on_saved=self._on_media_saved)
+        self.worker = self._make_worker(use_processes=False)
+        # Startup warm-up of the command-line engine; START swaps in the selected engine's event
+        self.models_ready = self.startup_ready = threading.Event()
+        self.warm_events = {get_engine(): self.startup_ready}
+        self.scan_started = None
+        self.first_result_latency = None
+        self.overlay_text = None        # Metrics overlay lines, swapped in by _refresh_stats
+        self._register_gauges()
 
-        try:
-            self.tts = pyttsx3.init()
-            self.tts.setProperty('rate', 140)
-        except: self.tts = None
+        self.speech = SpeechWorker()
+        self.analysis_enabled = True
+        self.startup = {"first_paint": None, "modules": None, "ready": None}
 
+        # Heavy imports and model loading happen in the background behind a progress bar
         self._build_interface()
         self._apply_tree_styles()
+        self._refresh_stats()
+        self.master.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.master.after_idle(self._on_first_paint)
+        threading.Thread(target=self._load_runtime, daemon=True).start()
 
     def _apply_tree_styles(self):
         """Apply styles to ttk Treeview for consistency with Aurora theme"""
@@ -298,18 +2296,19 @@ class EmotionTrackerApp:
         btn_container = ctk.CTkFrame(controls_frame, fg_color="transparent")
         btn_container.pack(fill="x", padx=15, pady=(0, 15))
         
-        # Start Button with Aurora gradient colors
-        start_btn = ctk.CTkButton(
+        # Start Button with Aurora gradient colors (enabled once camera support is loaded)
+        self.start_btn = ctk.CTkButton(
             btn_container,
-            text="▶ START AI SCAN",
+            text="⏳ LOADING...",
             command=self.start,
+            state="disabled",
             fg_color=AURORA_THEME["aurora_purple"],
             hover_color=AURORA_THEME["aurora_blue"],
             font=ctk.CTkFont(size=13, weight="bold"),
             height=45,
             corner_radius=10
         )
-        start_btn.pack(side="left", expand=True, fill="x", padx=(0, 5))
+        self.start_btn.pack(side="left", expand=True, fill="x", padx=(0, 5))
         
         # Stop Button
         stop_btn = ctk.CTkButton(
@@ -326,7 +2325,7 @@ class EmotionTrackerApp:
         
         # Voice toggle
         self.voice_var = ctk.BooleanVar(value=True)
-        voice_switch = ctk.CTkSwitch(
+        self.voice_switch = ctk.CTkSwitch(
             controls_frame,
             text="AI Voice Feedback",
             variable=self.voice_var,
@@ -335,7 +2334,35 @@ class EmotionTrackerApp:
             progress_color=AURORA_THEME["aurora_pink"],
             button_color=AURORA_THEME["aurora_cyan"]
         )
-        voice_switch.pack(pady=(0, 15))
+        self.voice_switch.pack(pady=(0, 10))
+
+        # Model readiness / time-to-first-result indicator
+        self.lbl_ready = ctk.CTkLabel(
+            controls_frame,
+            text="⏳ Starting...",
+            font=ctk.CTkFont(size=11),
+            text_color=AURORA_THEME["warning"]
+        )
+        self.lbl_ready.pack(pady=(0, 5))
+
+        # Startup progress (imports + model warm-up), removed once ready
+        self.load_progress = ctk.CTkProgressBar(
+            controls_frame,
+            height=6,
+            progress_color=AURORA_THEME["aurora_cyan"],
+            fg_color=AURORA_THEME["bg_dark"]
+        )
+        self.load_progress.set(0.0)
+        self.load_progress.pack(fill="x", padx=30, pady=(0, 8))
+
+        # Live pipeline statistics
+        self.lbl_perf = ctk.CTkLabel(
+            controls_frame,
+            text="📈 Analysis: idle",
+            font=ctk.CTkFont(size=11),
+            text_color=AURORA_THEME["text_secondary"]
+        )
+        self.lbl_perf.pack(pady=(0, 15))
         
         # Camera Settings
         settings_frame = ctk.CTkFrame(left_panel, fg_color=AURORA_THEME["bg_secondary"], corner_radius=10)
@@ -354,14 +2381,15 @@ class EmotionTrackerApp:
         
         ctk.CTkLabel(
             cam_container, 
-            text="Camera Index:",
+            text="Camera(s):",
             font=ctk.CTkFont(size=12),
             text_color=AURORA_THEME["text_secondary"]
         ).pack(side="left")
         
         self.cam_entry = ctk.CTkEntry(
             cam_container, 
-            width=60, 
+            width=140, 
+            placeholder_text="0, 1, ...",
             fg_color=AURORA_THEME["bg_card"],
             border_color=AURORA_THEME["aurora_purple"],
             text_color=AURORA_THEME["text_primary"]
@@ -369,6 +2397,109 @@ class EmotionTrackerApp:
         self.cam_entry.insert(0, "0")
         self.cam_entry.pack(side="left", padx=10)
 
+        # Capture format (applies to camera indices on next START)
+        fmt_container = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        fmt_container.pack(fill="x", padx=15, pady=(0, 15))
+
+        self.res_var = ctk.StringVar(value=f"{CAPTURE_DEFAULTS['width']}x{CAPTURE_DEFAULTS['height']}")
+        self.fps_var = ctk.StringVar(value=str(CAPTURE_DEFAULTS["fps"]))
+        self.fourcc_var = ctk.StringVar(value=CAPTURE_DEFAULTS["fourcc"])
+        for var, values, width in [(self.res_var, ["640x480", "1280x720", "1920x1080"], 110),
+                                   (self.fps_var, ["15", "24", "30", "60"], 60),
+                                   (self.fourcc_var, ["MJPG", "YUYV", "DEFAULT"], 90)]:
+            ctk.CTkOptionMenu(
+                fmt_container,
+                variable=var,
+                values=values,
+                width=width,
+                fg_color=AURORA_THEME["bg_card"],
+                button_color=AURORA_THEME["aurora_purple"],
+                button_hover_color=AURORA_THEME["aurora_blue"],
+                font=ctk.CTkFont(size=11)
+            ).pack(side="left", padx=(0, 6))
+
+        # Driver-side frame buffer: 1 keeps latency lowest, more smooths out slow reads
+        buf_container = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        buf_container.pack(fill="x", padx=15, pady=(0, 15))
+        ctk.CTkLabel(
+            buf_container,
+            text="Capture buffer:",
+            font=ctk.CTkFont(size=12),
+            text_color=AURORA_THEME["text_secondary"]
+        ).pack(side="left")
+        self.buffer_var = ctk.StringVar(value=str(CAPTURE_DEFAULTS["buffer_size"]))
+        ctk.CTkOptionMenu(
+            buf_container,
+            variable=self.buffer_var,
+            values=["1", "2", "3", "4", "8"],
+            width=60,
+            fg_color=AURORA_THEME["bg_card"],
+            button_color=AURORA_THEME["aurora_purple"],
+            button_hover_color=AURORA_THEME["aurora_blue"],
+            font=ctk.CTkFont(size=11)
+        ).pack(side="left", padx=10)
+
+        # Run inference in separate processes (applies on next START)
+        self.process_var = ctk.BooleanVar(value=False)
+        process_switch = ctk.CTkSwitch(
+            settings_frame,
+            text="Process-pool inference",
+            variable=self.process_var,
+            font=ctk.CTkFont(size=12),
+            text_color=AURORA_THEME["text_secondary"],
+            progress_color=AURORA_THEME["aurora_pink"],
+            button_color=AURORA_THEME["aurora_cyan"]
+        )
+        process_switch.pack(pady=(0, 5))
+
+        # Save a short clip around every change of the smoothed emotion
+        self.clip_var = ctk.BooleanVar(value=False)
+        clip_switch = ctk.CTkSwitch(
+            settings_frame,
+            text="Event clips on emotion change",
+            variable=self.clip_var,
+            font=ctk.CTkFont(size=12),
+            text_color=AURORA_THEME["text_secondary"],
+            progress_color=AURORA_THEME["aurora_pink"],
+            button_color=AURORA_THEME["aurora_cyan"]
+        )
+        clip_switch.pack(pady=(0, 5))
+
+        # Per-stage p50/p95/p99 drawn over the preview
+        self.overlay_var = ctk.BooleanVar(value=False)
+        overlay_switch = ctk.CTkSwitch(
+            settings_frame,
+            text="Pipeline metrics overlay",
+            variable=self.overlay_var,
+            font=ctk.CTkFont(size=12),
+            text_color=AURORA_THEME["text_secondary"],
+            progress_color=AURORA_THEME["aurora_pink"],
+            button_color=AURORA_THEME["aurora_cyan"]
+        )
+        overlay_switch.pack(pady=(0, 10))
+
+        # Emotion model precision (applies on next START; quantized files come from --quantize)
+        model_container = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        model_container.pack(fill="x", padx=15, pady=(0, 15))
+        ctk.CTkLabel(
+            model_container,
+            text="Emotion model:",
+            font=ctk.CTkFont(size=12),
+            text_color=AURORA_THEME["text_secondary"]
+        ).pack(side="left")
+        self.model_var = ctk.StringVar(value=ENGINE_SETTINGS["emotion_model"])
+        ctk.CTkOptionMenu(
+            model_container,
+            variable=self.model_var,
+            values=EMOTION_MODELS,
+            command=self._on_model_selected,
+            width=100,
+            fg_color=AURORA_THEME["bg_card"],
+            button_color=AURORA_THEME["aurora_purple"],
+            button_hover_color=AURORA_THEME["aurora_blue"],
+            font=ctk.CTkFont(size=11)
+        ).pack(side="left", padx=10)
+
     def _create_right_panel(self, parent):
         """Create right panel with dashboard and logs"""
         right_panel = ctk.CTkFrame(parent, fg_color=AURORA_THEME["bg_card"], corner_radius=15)
@@ -503,7 +2634,7 @@ class EmotionTrackerApp:
         
         self.tree = ttk.Treeview(
             tree_container, 
-            columns=("T", "E", "C"), 
+            columns=("T", "E", "C", "S"), 
             show="headings", 
             height=8,
             style="Aurora.Treeview"
@@ -511,9 +2642,11 @@ class EmotionTrackerApp:
         self.tree.heading("T", text="TIME")
         self.tree.heading("E", text="EMOTION")
         self.tree.heading("C", text="COMMENT")
+        self.tree.heading("S", text="SOURCE")
         self.tree.column("T", width=90)
         self.tree.column("E", width=110)
         self.tree.column("C", width=200)
+        self.tree.column("S", width=80)
         
         # Scrollbar
         scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.tree.yview)
@@ -521,6 +2654,7 @@ class EmotionTrackerApp:
         
         self.tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
+        self.history_view = HistoryView(self.master, self.tree)
 
     def _create_action_buttons(self, parent):
         """Create data action buttons"""
@@ -530,7 +2664,7 @@ class EmotionTrackerApp:
         actions = [
             ("💬 ADD COMMENT", self.add_comment, AURORA_THEME["bg_secondary"]),
             ("🗑️ CLEAR LOG", self.clear_history, AURORA_THEME["danger"]),
-            ("💾 EXPORT CSV", self.export_csv, AURORA_THEME["success"])
+            ("💾 EXPORT", self.export_data, AURORA_THEME["success"])
         ]
         
         for text, cmd, color in actions:
@@ -588,6 +2722,18 @@ class EmotionTrackerApp:
         )
         snap_btn.pack(side="left", expand=True, fill="x", padx=2)
 
+        det_btn = ctk.CTkButton(
+            feature_frame,
+            text="🔬 DETECTORS",
+            command=self.show_detector_stats,
+            fg_color=AURORA_THEME["bg_secondary"],
+            hover_color=AURORA_THEME["aurora_magenta"],
+            font=ctk.CTkFont(size=11),
+            height=40,
+            corner_radius=10
+        )
+        det_btn.pack(side="left", expand=True, fill="x", padx=2)
+
     # --- FUNCTIONAL LOGIC ---
 
     def _placeholder(self):
@@ -600,102 +2746,363 @@ class EmotionTrackerApp:
         self.preview.configure(image=tk_img)
         self.preview.image = tk_img
 
+    def _register_gauges(self):
+        """Queue depths and drop counters, read whenever metrics are sampled"""
+        streams = lambda: list(self.streams)
+        METRICS.gauge("threads", threading.active_count)
+        METRICS.gauge("queue.inference", lambda: len(self.worker.pending))
+        METRICS.gauge("queue.batcher", lambda: self.batcher.requests.qsize())
+        METRICS.gauge("queue.store", lambda: self.store.queue.qsize())
+        METRICS.gauge("queue.media", lambda: self.media.jobs.qsize())
+        METRICS.gauge("queue.speech", lambda: self.speech.jobs.qsize())
+        METRICS.gauge("inference.dropped", lambda: self.worker.stats["dropped"])
+        METRICS.gauge("inference.stale", lambda: self.worker.stats["stale"])
+        METRICS.gauge("inference.processed", lambda: self.worker.stats["processed"])
+        METRICS.gauge("frames.capture_skipped", lambda: sum(s.grabber.skipped for s in streams()))
+        METRICS.gauge("frames.preview_dropped", lambda: sum(s.renderer.dropped for s in streams() if s.renderer))
+        METRICS.gauge("frames.preview_rendered", lambda: sum(s.renderer.rendered for s in streams() if s.renderer))
+        METRICS.gauge("frames.gate_skipped", lambda: sum(s.gate.skipped for s in streams()))
+        METRICS.gauge("frames.pool_fallback", lambda: sum(s.grabber.pool.stats["fallback"] for s in streams()))
+        METRICS.gauge("frames.alloc_mb_s", lambda: round(sum(s.grabber.pool.alloc_rate() for s in streams()) / 2**20, 2))
+        METRICS.gauge("process.rss_mb", _rss_mb)
+        METRICS.gauge("cache.hit_rate", lambda: round(self.emotion_cache.hit_rate(), 3))
+        METRICS.gauge("cache.entries", lambda: len(self.emotion_cache.entries))
+
+    def _refresh_stats(self):
+        """Periodically report achieved analysis rate and worker counters"""
+        if self.overlay_var.get():
+            snap = METRICS.snapshot()
+            g = snap["gauges"]
+            self.overlay_text = METRICS.overlay_lines(snap) + [
+                f"threads {g.get('threads')} | queues inference {g.get('queue.inference')} "
+                f"batcher {g.get('queue.batcher')} store {g.get('queue.store')}"]
+        else:
+            self.overlay_text = None
+        if self.running and self.streams:
+            st = self.worker.stats
+            hz = sum(s.scheduler.achieved_hz() for s in self.streams)
+            target = sum(s.scheduler.target_hz() for s in self.streams)
+            lats = [s.scheduler.latency for s in self.streams if s.scheduler.latency]
+            lat = f"{sum(lats) / len(lats) * 1000:.0f} ms" if lats else "--"
+            checked = sum(s.gate.checked for s in self.streams)
+            reused = sum(s.gate.skipped for s in self.streams) / checked if checked else 0.0
+            sch = self.streams[0].scheduler
+            cap_fps = sum(s.grabber.fps() for s in self.streams) / len(self.streams)
+            disp = [s.renderer.latency for s in self.streams if s.renderer.latency]
+            res = [s.result_latency for s in self.streams if s.result_latency]
+            disp = f"{sum(disp) / len(disp) * 1000:.0f} ms" if disp else "--"
+            res = f"{sum(res) / len(res) * 1000:.0f} ms" if res else "--"
+            rendered = sum(s.renderer.rendered for s in self.streams)
+            skipped = sum(s.renderer.dropped for s in self.streams)
+            pools = [s.grabber.pool for s in self.streams]
+            held = sum(p.in_use() for p in pools)
+            fallback = sum(p.stats["fallback"] for p in pools)
+            alloc = sum(p.alloc_rate() for p in pools) / 2**20
+            rss = _rss_mb()
+            self.lbl_perf.configure(
+                text=f"📈 {len(self.streams)} stream(s) {hz:.1f}/{target:.1f} Hz "
+                     f"[{sch.min_hz:g}-{sch.max_hz:g}] | {lat} | dropped {st['dropped']} stale {st['stale']} "
+                     f"| reused {reused:.0%} | {self.emotion_cache.summary()}\n{self.batcher.summary()} "
+                     f"| preview {rendered} drawn / {skipped} dropped\n"
+                     f"capture {cap_fps:.0f} fps | capture→display {disp} | capture→result {res}\n"
+                     f"frame pool {held}/{sum(p.slots for p in pools)} held, {fallback} fallback | "
+                     f"alloc {alloc:.1f} MB/s | RSS {f'{rss:.0f} MB' if rss else '--'}")
+        self.master.after(1000, self._refresh_stats)
+
+    def _on_first_paint(self):
+        self.startup["first_paint"] = time.perf_counter() - STARTUP_T0
+        METRICS.gauge("startup.first_paint_s", lambda: self.startup["first_paint"])
+
+    def _set_progress(self, fraction, text):
+        """Background-thread safe update of the startup progress bar"""
+        def apply():
+            self.load_progress.set(fraction)
+            if text: self.lbl_ready.configure(text=text, text_color=AURORA_THEME["warning"])
+        self.master.after(0, apply)
+
+    def _load_runtime(self):
+        """Background: import the heavy modules, enable what loaded, then warm up the models"""
+        # Imports take the first 60% of the bar, model warm-up the rest
+        errors = load_runtime_modules(lambda f, text: self._set_progress(0.6 * f, text))
+        self.startup["modules"] = time.perf_counter() - STARTUP_T0
+        self.master.after(0, lambda: self._on_modules_loaded(dict(errors)))
+        elapsed, failed = None, "deepface" in errors
+        try:
+            if not failed:
+                self._set_progress(0.6, "⏳ Warming up AI models...")
+                elapsed = warm_up_models()
+        except Exception as e:
+            failed = str(e) or True
+        finally:
+            self.startup_ready.set()
+        self.startup["ready"] = time.perf_counter() - STARTUP_T0
+        METRICS.gauge("startup.ready_s", lambda: self.startup["ready"])
+        self.master.after(0, lambda: self._on_ready(elapsed, failed))
+
+    def _on_modules_loaded(self, errors):
+        """Tk thread: switch on the features whose modules imported, disable the rest"""
+        if "cv2" in errors:
+            self.start_btn.configure(text="⚠️ CAMERA UNAVAILABLE", state="disabled")
+        else:
+            self.start_btn.configure(text="▶ START AI SCAN", state="normal")
+        self.analysis_enabled = "deepface" not in errors and "cv2" not in errors
+        if "pyttsx3" in errors:
+            self.voice_var.set(False)
+            self.voice_switch.configure(state="disabled", text="AI Voice Feedback (unavailable)")
+        else:
+            self.speech.start()
+
+    def _on_ready(self, elapsed, failed):
+        self.load_progress.pack_forget()
+        st = self.startup
+        timing = f"first paint {st['first_paint'] or 0:.2f}s, ready {st['ready']:.1f}s"
+        if "deepface" in MODULE_ERRORS or "cv2" in MODULE_ERRORS:
+            missing = ", ".join(sorted(MODULE_ERRORS))
+            self.lbl_ready.configure(text=f"⚠️ Missing {missing}: AI analysis disabled ({timing})",
+                                     text_color=AURORA_THEME["danger"])
+        elif failed:
+            reason = f": {failed}" if isinstance(failed, str) else ""
+            self.lbl_ready.configure(text=f"⚠️ Model preload failed{reason}, loading on first scan ({timing})",
+                                     text_color=AURORA_THEME["danger"])
+        else:
+            self.lbl_ready.configure(text=f"✅ {get_engine().name} models ready in {elapsed:.1f}s ({timing})",
+                                     text_color=AURORA_THEME["success"])
+
+    def _on_model_selected(self, choice):
+        """Load the chosen emotion model in the background so the next START doesn't stall"""
+        engine = get_engine({"emotion_model": choice})
+        if isinstance(engine, QuantizedEmotionEngine) and not os.path.exists(engine.path):
+            self.lbl_ready.configure(text=f"⚠️ {engine.path} not found: run --quantize {choice}",
+                                     text_color=AURORA_THEME["danger"])
+            return
+        if not self.process_var.get(): self._warm_engine(engine)
+
+    def _warm_engine(self, engine):
+        """Warm `engine` once, off the Tk thread; returns an Event set when it is usable"""
+        if engine not in self.warm_events:
+            ready = self.warm_events[engine] = threading.Event()
+            self.lbl_ready.configure(text=f"⏳ Loading {engine.name} models...", text_color=AURORA_THEME["warning"])
+            threading.Thread(target=self._warm_engine_thread, args=(engine, ready), daemon=True).start()
+        return self.warm_events[engine]
+
+    def _warm_engine_thread(self, engine, ready):
+        self.startup_ready.wait()       # Heavy modules are imported by _load_runtime first
+        try:
+            elapsed = warm_up_models(engine=engine)
+            text, color = f"✅ {engine.name} models ready in {elapsed:.1f}s", AURORA_THEME["success"]
+        except Exception as e:
+            text, color = f"⚠️ {engine.name} preload failed, loading on first scan: {e}", AURORA_THEME["danger"]
+        finally:
+            ready.set()
+        self.master.after(0, lambda: self.lbl_ready.configure(text=text, text_color=color))
+
+    def _make_worker(self, use_processes, streams=1):
+        if use_processes:
+            return ProcessInferenceWorker(self._on_analysis, processes=max(1, min(2, (os.cpu_count() or 2) // 2)),
+                                          on_latency=self._on_latency, post=self._post_analysis,
+                                          on_release=self._release_job, on_error=self._on_worker_error)
+        # One thread per stream (capped) so tracked crops can meet in the emotion batcher
+        return InferenceWorker(self._ai_analysis, self._on_analysis, workers=min(streams, 4),
+                               on_latency=self._on_latency, on_release=self._release_job)
+
+    def _on_worker_error(self, message, processes_left):
+        hint = "" if processes_left else " - no inference processes left, turn off process-pool inference"
+        self.master.after(0, lambda: self.lbl_ready.configure(text=f"⚠️ {message}{hint}",
+                                                              text_color=AURORA_THEME["danger"]))
+
+    def _release_job(self, key, job):
+        """Worker is done with a job: drop its hold on the capture buffer"""
+        if key < len(self.streams): self.streams[key].grabber.release(job[0])
+
     def start(self):
         if self.running: return
-        try:
-            idx = int(self.cam_entry.get())
-        except ValueError:
-            idx = 0
-        self.cap = cv2.VideoCapture(idx)
-        if not self.cap.isOpened(): 
-            messagebox.showerror("Error", "Camera Not Found")
+        engine = get_engine({"emotion_model": self.model_var.get()})
+        if isinstance(engine, QuantizedEmotionEngine) and not os.path.exists(engine.path):
+            messagebox.showerror("Error", f"Quantized model not found: {engine.path}\n"
+                                          f"Create it with: python main.py --quantize {engine.precision}")
+            return
+        ENGINE_SETTINGS["emotion_model"] = self.model_var.get()
+        use_processes = self.process_var.get()
+        # Worker processes load their own models; a copy in the UI process would only cost memory
+        if not use_processes: self.models_ready = self._warm_engine(engine)
+        sources = CameraStream.parse_sources(self.cam_entry.get())
+        # Share the CPU budget fairly between streams
+        batcher = None if use_processes else self.batcher
+        capture = self._capture_settings()
+        streams = [CameraStream(i, src, cpu_budget=0.5 / len(sources), batcher=batcher, capture=capture,
+                                cascade=self.cascade, cache=self.emotion_cache)
+                   for i, src in enumerate(sources)]
+        failed = [s.name for s in streams if not s.open()]
+        if failed:
+            for s in streams: s.release()
+            messagebox.showerror("Error", f"Camera Not Found: {', '.join(failed)}")
             return
+        self.streams = streams
+        self._build_tiles()
         self.running = True
-        threading.Thread(target=self._main_loop, daemon=True).start()
+        self.store.start_session([str(s.source) for s in self.streams])
+        self.scan_started = time.perf_counter()
+        self.first_result_latency = None
+        self.worker = self._make_worker(use_processes, len(self.streams))
+        if batcher: batcher.start()
+        self.worker.start()
+        for stream in self.streams:
+            threading.Thread(target=self._main_loop, args=(stream,), daemon=True).start()
+
+    def _capture_settings(self):
+        """Capture settings from the UI, falling back to CAPTURE_DEFAULTS"""
+        settings = dict(CAPTURE_DEFAULTS)
+        try:
+            settings["width"], settings["height"] = (int(v) for v in self.res_var.get().split("x"))
+            settings["fps"] = int(self.fps_var.get())
+            settings["buffer_size"] = int(self.buffer_var.get())
+        except ValueError:
+            pass
+        fourcc = self.fourcc_var.get()
+        settings["fourcc"] = fourcc if len(fourcc) == 4 else None
+        return settings
 
     def stop(self):
-        self.running = False
-        if self.cap: self.cap.release()
+        was_running, self.running = self.running, False
+        # Batcher first: it releases crops the worker threads are waiting on, so their join is quick
+        self.batcher.stop()
+        self.worker.stop()
+        if was_running: self.store.end_session()
+        for stream in self.streams: stream.release()
+        if self.tile_frame is not None:
+            self.tile_frame.destroy()
+            self.tile_frame = None
+            self.preview.pack(padx=3, pady=3)
         self._placeholder()
 
-    def _main_loop(self):
+    def _build_tiles(self):
+        """One preview tile per stream, laid out in a grid inside the preview area"""
+        n = len(self.streams)
+        cols = int(np.ceil(np.sqrt(n)))
+        rows = int(np.ceil(n / cols))
+        self.tile_size = (530 // cols - (4 if n > 1 else 0), 380 // rows - (4 if n > 1 else 0))
+        self.preview.pack_forget()
+        self.tile_frame = ctk.CTkFrame(self.preview.master, fg_color="transparent")
+        self.tile_frame.pack(padx=3, pady=3)
+        for i, stream in enumerate(self.streams):
+            stream.tile = ctk.CTkLabel(self.tile_frame, text="", fg_color="#000000", corner_radius=8)
+            stream.tile.grid(row=i // cols, column=i % cols, padx=2 if n > 1 else 0, pady=2 if n > 1 else 0)
+            stream.renderer = PreviewRenderer(self.master, stream.tile, self.tile_size)
+
+    def _main_loop(self, stream):
+        """Track/dispatch/render loop for one stream, fed by its capture thread"""
+        seq = 0
         while self.running:
-            ret, frame = self.cap.read()
-            if not ret: break
-            self.frame = frame.copy()
-            
-            if EmotionTrackerApp.face_rect:
-                x, y, w, h = EmotionTrackerApp.face_rect
-                # Aurora-styled face rectangle
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 230), 2)  # Purple/Pink color
-
-            if time.time() - self.last_analysis > 1.5:  # Analysis interval
-                self.last_analysis = time.time()
-                threading.Thread(target=self._ai_analysis, args=(frame.copy(),), daemon=True).start()
-
-            img = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(img).resize((530, 380))
-            tk_img = ImageTk.PhotoImage(img)
-            self.master.after(0, self._update_video, tk_img)
-            time.sleep(0.01)
-
-    def _update_video(self, img):
-        self.preview.configure(image=img)
-        self.preview.image = img
-
-    def _ai_analysis(self, frame):
-        try:
-            # Enhanced detection with RetinaFace for better accuracy
-            res = DeepFace.analyze(
-                frame, 
-                actions=['emotion'], 
-                enforce_detection=False,  # Allow graceful handling when no face detected
-                detector_backend='retinaface',  # More accurate face detection
-                silent=True
-            )[0]
-            dom = res['dominant_emotion']
-            r = res['region']
-            EmotionTrackerApp.face_rect = (r['x'], r['y'], r['w'], r['h'])
-            self.smoother.add(dom)
-            smoothed = self.smoother.get()
-            self.master.after(0, lambda: self._process_result(smoothed))
-        except Exception:
-            # Try alternative detection if RetinaFace fails
-            try:
-                res = DeepFace.analyze(
-                    frame, 
-                    actions=['emotion'], 
-                    enforce_detection=False,
-                    detector_backend='opencv',
-                    silent=True
-                )[0]
-                dom = res['dominant_emotion']
-                r = res['region']
-                EmotionTrackerApp.face_rect = (r['x'], r['y'], r['w'], r['h'])
-                self.smoother.add(dom)
-                smoothed = self.smoother.get()
-                self.master.after(0, lambda: self._process_result(smoothed))
-            except:
-                EmotionTrackerApp.face_rect = None
-
-    def _process_result(self, emo):
+            got = stream.grabber.latest(seq, timeout=1.0)
+            if got is None:
+                if not stream.grabber.alive: break
+                continue
+            frame, ts, seq = got
+            # Stages below read this pooled buffer in place; the previous one is handed back
+            with stream.lock:
+                previous, stream.frame = stream.frame, frame
+            stream.grabber.release(previous)
+            stream.ring.push(frame, ts)
+            # Cheap per-frame tracking keeps the box live between detections
+            t0 = time.perf_counter()
+            stream.face_rect, rect = stream.pipeline.track(stream.frame)
+            METRICS.record("track", time.perf_counter() - t0)
+
+            now = time.time()
+            stream.scheduler.face_present = stream.face_rect is not None
+            if self.analysis_enabled and stream.scheduler.due(now):
+                stream.scheduler.mark_dispatched(now)
+                if stream.gate.changed(stream.frame, stream.face_rect) or stream.last_result is None:
+                    # Tag with the capture time so results can be aged end to end
+                    self.worker.submit((stream.grabber.pool.retain(frame), rect), ts, key=stream.key)
+                else:
+                    # Scene unchanged: reuse the last result instead of re-running inference
+                    self._apply_result(stream, stream.last_result, ts)
+
+            # Annotations go on the downsized preview copy, never on the analysed frame
+            text = f"{stream.name}: {stream.emotion.upper()}" if len(self.streams) > 1 and stream.emotion else None
+            stream.renderer.submit(frame, stream.face_rect, text, ts, self.overlay_text)
+
+    def _ai_analysis(self, key, job):
+        """Runs on the inference worker; returns (emotion, region, scores) or None"""
+        self.models_ready.wait()
+        return self.streams[key].pipeline.analyze(*job)
+
+    def _post_analysis(self, key, frame, rect, result):
+        """Process-pool hook: re-seed the stream's tracker in this process"""
+        self.streams[key].pipeline.update_track(frame, rect, result)
+
+    def _on_latency(self, key, seconds):
+        METRICS.record("inference", seconds)
+        self.streams[key].scheduler.record_latency(seconds)
+
+    def _on_analysis(self, key, ts, result):
+        """Worker callback for the newest non-stale result of a stream"""
+        stream = self.streams[key]
+        stream.record_result_latency(ts)
+        self._apply_result(stream, result, ts)
+
+    def _apply_result(self, stream, result, ts=None):
+        """`ts` is the capture time of the analysed frame"""
+        if result is None:
+            return
+        dom, _, scores = result
+        with stream.lock:
+            stream.last_result = result
+            stream.smoother.add(dom, scores)
+            smoothed = stream.emotion = stream.smoother.get()
+            confidence = stream.smoother.confidence()
+        self.master.after(0, lambda: self._process_result(smoothed, stream, confidence, result, ts))
+
+    def _process_result(self, emo, stream=None, confidence=None, result=None, ts=None):
+        t0 = time.perf_counter()
+        if self.first_result_latency is None and self.scan_started is not None:
+            self.first_result_latency = time.perf_counter() - self.scan_started
+            self.lbl_ready.configure(text=f"⚡ First result {self.first_result_latency:.2f}s after start",
+                                     text_color=AURORA_THEME["aurora_cyan"])
         self.current_emo_key = emo
         data = EMOTION_DATA.get(emo, EMOTION_DATA["neutral"])
         media, pos, streak = self.media_mgr.get_media(emo)
         
         # UI Updates with Aurora colors
         self.lbl_emoji.configure(text=data['emoji'])
-        self.lbl_emo.configure(text=emo.upper(), text_color=data['color'])
+        conf = f"  {confidence:.0%}" if confidence is not None else ""
+        self.lbl_emo.configure(text=f"{emo.upper()}{conf}", text_color=data['color'])
         self.lbl_adv.configure(text=data['reason'])
         self.lbl_cycle.configure(text=f"📊 Cycle: {pos+1}/3 | Streak: {streak} detections")
         
         # History
-        t = datetime.now().strftime("%H:%M:%S")
-        self.tree.insert("", 0, values=(t, emo.upper(), ""), tags=(emo,))
-        self.history.appendleft({"time": t, "emo": emo, "media": media, "comment": ""})
+        t = datetime.fromtimestamp(ts or time.time()).strftime("%H:%M:%S")
+        src = stream.name if stream else ""
+        previous = stream.history[0]["emo"] if stream and stream.history else None
+        if previous and previous != emo and self.clip_var.get():
+            self._schedule_clip(stream, previous, emo)
+        raw, rect, scores = result if result else (None, None, None)
+        seq = self.store.append(emo, ts=ts, source=src, raw=raw, confidence=confidence, scores=scores, rect=rect)
+        record = {"id": seq, "session": self.store.session, "time": t, "emo": emo, "media": media,
+                  "comment": "", "source": src, "confidence": confidence}
+        self.history_view.add(record)
+        self.history.appendleft(record)
+        if stream: stream.history.appendleft(record)
+
+        if self.voice_var.get():
+            self.speech.say(emo)
+        METRICS.record("ui.result", time.perf_counter() - t0)
+
+    def _schedule_clip(self, stream, before, after):
+        """Hand the event to the media writer once its post-event frames exist"""
+        event_ts = time.time()
+        prefix = f"{stream.name.replace(' ', '')}_{before}-to-{after}"
+        self.master.after(int(self.media.post * 1000) + 100, lambda: self.media.clip(stream.ring, event_ts, prefix))
 
-        if self.voice_var.get() and self.tts:
-            threading.Thread(target=lambda: (self.tts.say(f"{emo}"), self.tts.runAndWait()), daemon=True).start()
+    def _on_store_error(self, error, rows):
+        self.master.after(0, lambda: self.lbl_ready.configure(
+            text=f"⚠️ History not saved ({rows} rows, {self.store.failed} total): {error}",
+            text_color=AURORA_THEME["danger"]))
+
+    def _on_media_saved(self, path, error):
+        if error:
+            self.master.after(0, lambda: messagebox.showerror("Save Failed", f"{os.path.basename(path)}: {error}"))
 
     # --- ACTION METHODS ---
 
@@ -713,18 +3120,14 @@ class EmotionTrackerApp:
         comment = dialog.get_input()
         
         if comment:
-            curr = list(self.tree.item(sel[0], 'values'))
-            curr[2] = comment
-            self.tree.item(sel[0], values=curr)
-            # Sync with history list
-            for h in self.history:
-                if h["time"] == curr[0]: 
-                    h["comment"] = comment
-                    break
+            # Item ids are record ids, so no scan over the history is needed
+            record = self.history_view.set_comment(sel[0], comment)
+            if record and record.get("id") is not None:
+                self.store.set_comment(record["session"], record["id"], comment)
 
     def clear_history(self):
-        if messagebox.askyesno("Confirm", "Clear all session logs?"):
-            self.tree.delete(*self.tree.get_children())
+        if messagebox.askyesno("Confirm", "Clear the on-screen log? Saved sessions are kept."):
+            self.history_view.clear()
             self.history.clear()
 
     def open_song(self): 
@@ -737,21 +3140,94 @@ class EmotionTrackerApp:
         if self.history: webbrowser.open(self.history[0]['media']['alt'])
 
     def take_snapshot(self):
-        if self.frame is not None:
-            fn = f"scan_{datetime.now().strftime('%H%M%S')}.jpg"
-            cv2.imwrite(fn, self.frame)
-            messagebox.showinfo("Saved", f"Snapshot saved: {fn}")
-
-    def export_csv(self):
-        if not self.history: 
-            messagebox.showinfo("Info", "No data to export")
+        # Encoding happens on the media writer thread; only the frame copy is paid here
+        saved = []
+        for stream in self.streams:
+            suffix = f"_{stream.key}" if len(self.streams) > 1 else ""
+            # Copy under the stream lock so the pooled buffer can't be recycled mid-copy
+            with stream.lock:
+                if stream.frame is None: continue
+                path = self.media.snapshot(stream.frame, prefix=f"scan{suffix}")
+            if path: saved.append(os.path.basename(path))
+        if saved:
+            messagebox.showinfo("Saved", f"Snapshot saving to {self.media.folder}/: {', '.join(saved)}")
+
+    def export_data(self):
+        """Export dialog: format, range and emotion filters, with a progress bar"""
+        if self.exporter.busy:
+            messagebox.showinfo("Export", "An export is already running")
             return
-        with open("emotion_pro_report.csv", "w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["Time", "Emotion", "Comment"])
-            for h in self.history: 
-                w.writerow([h['time'], h['emo'], h['comment']])
-        messagebox.showinfo("Export", "CSV Saved: emotion_pro_report.csv")
+        win = ctk.CTkToplevel(self.master)
+        win.title("Export Session Data")
+        win.geometry("420x360")
+        win.configure(fg_color=AURORA_THEME["bg_dark"])
+
+        ctk.CTkLabel(
+            win,
+            text="💾 EXPORT SESSION DATA",
+            font=ctk.CTkFont(size=18, weight="bold"),
+            text_color=AURORA_THEME["aurora_cyan"]
+        ).pack(pady=(20, 10))
+
+        form = ctk.CTkFrame(win, fg_color=AURORA_THEME["bg_card"], corner_radius=12)
+        form.pack(fill="x", padx=20)
+        fmt_var = ctk.StringVar(value="CSV")
+        range_var = ctk.StringVar(value="Current session")
+        emo_var = ctk.StringVar(value="All emotions")
+        for label, var, values in [("Format", fmt_var, available_export_formats()),
+                                   ("Range", range_var, ["Current session", "Last 15 minutes", "Last hour",
+                                                         "Today", "All sessions"]),
+                                   ("Emotion", emo_var, ["All emotions"] + list(EMOTION_DATA))]:
+            row = ctk.CTkFrame(form, fg_color="transparent")
+            row.pack(fill="x", padx=15, pady=6)
+            ctk.CTkLabel(row, text=label, width=80, anchor="w",
+                         text_color=AURORA_THEME["text_secondary"]).pack(side="left")
+            ctk.CTkOptionMenu(row, variable=var, values=values, fg_color=AURORA_THEME["bg_secondary"],
+                              button_color=AURORA_THEME["aurora_purple"]).pack(side="left", fill="x", expand=True)
+
+        progress = ctk.CTkProgressBar(win, progress_color=AURORA_THEME["aurora_pink"])
+        progress.set(0)
+        progress.pack(fill="x", padx=20, pady=(15, 5))
+        status = ctk.CTkLabel(win, text="", font=ctk.CTkFont(size=11), text_color=AURORA_THEME["text_secondary"])
+        status.pack()
+
+        def on_progress(done, total):
+            self.master.after(0, lambda: (progress.set(done / total if total else 1),
+                                          status.configure(text=f"{done:,} / {total:,} rows")))
+
+        def on_done(path, done, error):
+            def finish():
+                if error: messagebox.showerror("Export", f"Export failed after {done:,} rows: {error}")
+                else: messagebox.showinfo("Export", f"Saved {done:,} rows: {path}")
+                if win.winfo_exists(): start_btn.configure(state="normal")
+            self.master.after(0, finish)
+
+        def run():
+            now = time.time()
+            start = {"Last 15 minutes": now - 900, "Last hour": now - 3600,
+                     "Today": datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+                     }.get(range_var.get())
+            session = self.store.session if range_var.get() == "Current session" else None
+            if range_var.get() == "Current session" and session is None:
+                messagebox.showinfo("Info", "No data to export")
+                return
+            emotions = None if emo_var.get() == "All emotions" else [emo_var.get()]
+            path = "emotion_pro_report" + EXPORT_FORMATS[fmt_var.get()]
+            if self.exporter.start(path, fmt_var.get(), on_progress, on_done,
+                                   session=session, start=start, emotions=emotions):
+                start_btn.configure(state="disabled")
+                status.configure(text="Starting export...")
+
+        start_btn = ctk.CTkButton(
+            win,
+            text="EXPORT",
+            command=run,
+            fg_color=AURORA_THEME["success"],
+            hover_color=AURORA_THEME["aurora_purple"],
+            font=ctk.CTkFont(size=12, weight="bold"),
+            width=140
+        )
+        start_btn.pack(pady=15)
 
     def ai_report(self):
         emo = self.current_emo_key
@@ -879,6 +3355,20 @@ class EmotionTrackerApp:
             )
             action_label.pack(anchor="w", padx=15, pady=(5, 15))
 
+    def show_detector_stats(self):
+        """Per-backend success rate, latency and circuit-breaker state"""
+        note = "\n\n(Process-pool mode keeps these stats inside the worker processes.)" \
+            if isinstance(self.worker, ProcessInferenceWorker) else ""
+        self._popup("Detector Backends", self.cascade.summary() + note)
+
+    def _on_close(self):
+        """Stop capture and flush the session store before the window goes away"""
+        self.stop()
+        self.store.close()
+        self.media.close()
+        self.speech.stop()
+        self.master.destroy()
+
     def _popup(self, title, txt):
         """Create Aurora-styled popup"""
         popup = ctk.CTkToplevel(self.master)
@@ -906,7 +3396,498 @@ class EmotionTrackerApp:
         )
         close_btn.pack(pady=10)
 
+# =========================
+# HEADLESS BATCH MODE
+# =========================
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+BATCH_FIELDS = ["frame", "time", "source", "emotion", "smoothed", "confidence", "x", "y", "w", "h"] + EMOTION_LABELS
+
+def _open_batch_source(path):
+    """Returns (image_files or None, frame_count, fps) for a video file or image folder"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTS))
+        return files, len(files), None
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened(): raise IOError(f"Cannot open video: {path}")
+    count, fps = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return None, count, fps
+
+def _iter_batch_frames(path, files, start, stop, stride):
+    """Yields (index, name, frame) for frames start..stop of the source"""
+    if files is not None:
+        for i in range(start, stop):
+            if i % stride: continue
+            frame = cv2.imread(files[i])
+            if frame is not None: yield i, os.path.basename(files[i]), frame
+        return
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    try:
+        for i in range(start, stop):
+            if i % stride:
+                if not cap.grab(): break
+                continue
+            ret, frame = cap.read()
+            if not ret: break
+            yield i, os.path.basename(path), frame
+    finally:
+        cap.release()
+
+def _batch_worker_init(engine_settings):
+    ENGINE_SETTINGS.update(engine_settings)
+    load_runtime_modules()
+    warm_up_models()
+
+def _batch_worker(task):
+    """Process-pool entry: runs the tracking + emotion pipeline over one frame range"""
+    path, files, start, stop, stride, fps, detectors, cache_path = task
+    cache = EmotionCache(disk_path=cache_path)
+    pipeline = EmotionPipeline(cascade=DetectorCascade(detectors), cache=cache, cache_frames=True)
+    rows = []
+    try:
+        for i, name, frame in _iter_batch_frames(path, files, start, stop, stride):
+            _, rect = pipeline.track(frame)
+            result = pipeline.analyze(frame, rect)
+            emo, region, scores = result if result else (None, None, None)
+            x, y, w, h = region or ("", "", "", "")
+            row = {"frame": i, "time": round(i / fps, 3) if fps else "", "source": name,
+                   "emotion": emo or "", "x": x, "y": y, "w": w, "h": h}
+            row.update({label: round(float(scores.get(label, 0.0)), 2) if scores else "" for label in EMOTION_LABELS})
+            rows.append(row)
+    finally:
+        cache.close()
+    return rows, pipeline.cascade.stats, cache.stats
+
+def run_batch(path, out_path, workers=None, chunk=200, stride=1, detectors=None, cache_path=None):
+    """Score a video file or image folder offline, streaming rows to CSV or JSONL.
+
+    `cache_path` keeps emotion results in an on-disk EmotionCache, so rescoring
+    the same material skips inference for frames and crops seen before.
+    """
+    files, count, fps = _open_batch_source(path)
+    if count <= 0:
+        print(f"No frames found in {path}")
+        return 0
+    detectors = detectors or get_engine().detectors
+    tasks = [(path, files, s, min(s + chunk, count), stride, fps, detectors, cache_path)
+             for s in range(0, count, chunk)]
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    as_jsonl = out_path.lower().endswith((".jsonl", ".ndjson"))
+    smoother = EmotionSmoother()
+    totals = {}                         # Detector stats merged across chunks
+    cache_totals = {}
+    done, t0 = 0, time.perf_counter()
+
+    # spawn keeps each worker's TensorFlow state independent of the parent
+    with open(out_path, "w", newline="") as f, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                initializer=_batch_worker_init, initargs=(dict(ENGINE_SETTINGS),)) as pool:
+        writer = None if as_jsonl else csv.DictWriter(f, fieldnames=BATCH_FIELDS)
+        if writer: writer.writeheader()
+        # map() yields chunks in frame order, so smoothing stays sequential
+        for rows, stats, cache_stats in pool.map(_batch_worker, tasks):
+            for name, n in cache_stats.items(): cache_totals[name] = cache_totals.get(name, 0) + n
+            for backend, st in stats.items():
+                agg = totals.setdefault(backend, {"calls": 0, "ok": 0, "seconds": 0.0})
+                agg["calls"] += st["calls"]
+                agg["ok"] += st["ok"]
+                agg["seconds"] += (st["latency"] or 0.0) * st["ok"]
+            for row in rows:
+                if row["emotion"]:
+                    # Smooth on media time (or frame index for image folders)
+                    t = row["time"] if row["time"] != "" else row["frame"]
+                    scores = {label: row[label] for label in EMOTION_LABELS if row[label] != ""}
+                    smoother.add(row["emotion"], scores, t)
+                row["smoothed"] = smoother.get()
+                row["confidence"] = round(smoother.confidence(), 3)
+                if writer: writer.writerow(row)
+                else: f.write(json.dumps(row) + "\n")
+            f.flush()
+            done += len(rows)
+            elapsed = time.perf_counter() - t0
+            print(f"{done}/{(count + stride - 1) // stride} frames | {done / elapsed:.1f} fps")
+
+    elapsed = time.perf_counter() - t0
+    print(f"Done: {done} frames in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.1f} fps) -> {out_path}")
+    for backend, agg in totals.items():
+        if agg["calls"]:
+            lat = agg["seconds"] / agg["ok"] * 1000 if agg["ok"] else 0.0
+            print(f"  detector {backend:<11} {agg['calls']:>6} calls  ok {agg['ok'] / agg['calls']:.0%}  ~{lat:.0f} ms")
+    lookups = sum(cache_totals.get(name, 0) for name in ("hits", "disk_hits", "misses"))
+    if lookups:
+        print(f"  cache {cache_totals['hits']} memory + {cache_totals['disk_hits']} disk hits of {lookups} lookups, "
+              f"{cache_totals['uncacheable']} too flat to cache, {cache_totals['disk_errors']} disk errors")
+    return done
+
+# =========================
+# OFFLINE BENCHMARK
+# =========================
+
+def _peak_rss_mb():
+    """Peak resident set size of this process, or None where unavailable"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+        except ImportError:
+            return None
+
+def _rss_mb():
+    """Current resident set size of this process, or None where unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        except ImportError:
+            return None
+
+def _benchmark_capture(source, frames):
+    """Decode rate and per-frame allocation of plain cap.read() vs the pooled FrameGrabber"""
+    mb = 1024 * 1024
+    cap = cv2.VideoCapture(source)
+    count, nbytes, t0 = 0, 0, time.perf_counter()
+    while count < frames:
+        ret, frame = cap.read()
+        if not ret: break
+        count += 1
+        nbytes += frame.nbytes
+    wall = time.perf_counter() - t0
+    cap.release()
+    results = {"unpooled": {"frames": count, "fps": round(count / wall, 1) if wall else 0.0,
+                            "alloc_mb_s": round(nbytes / wall / mb, 1) if wall else 0.0, "rss_mb": _rss_mb()}}
+
+    grabber = FrameGrabber(source)
+    if not grabber.open(): return results
+    grabber.pace = 0.0                  # Decode flat out instead of at the file's FPS
+    grabber.start()
+    count, seq, t0 = 0, 0, time.perf_counter()
+    while count < frames:
+        got = grabber.latest(seq, timeout=1.0)
+        if got is None: break
+        frame, _, seq = got
+        count += 1
+        grabber.release(frame)
+    wall = time.perf_counter() - t0
+    decoded = grabber.seq
+    grabber.stop()
+    pool = grabber.pool
+    results["pooled"] = {"frames": decoded, "fps": round(decoded / wall, 1) if wall else 0.0,
+                         "alloc_mb_s": round(pool.stats["allocated_bytes"] / wall / mb, 1) if wall else 0.0,
+                         "pool_mb": round(pool.stats["pool_bytes"] / mb, 1), "fallback": pool.stats["fallback"],
+                         "rss_mb": _rss_mb()}
+    return results
+
+def _benchmark_frames(source, count, size=(1280, 720)):
+    """Yields up to `count` BGR frames from a video file, or synthetic ones for source == 'synthetic'"""
+    if source == "synthetic":
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+        for i in range(count):
+            frame = base.copy()
+            # A drifting face-sized blob keeps the tracker and change gate busy
+            cx, cy = size[0] // 2 + int(80 * np.sin(i / 15)), size[1] // 2
+            cv2.ellipse(frame, (cx, cy), (90, 120), 0, 0, 360, (140, 170, 210), -1)
+            yield frame
+        return
+    cap = cv2.VideoCapture(source)
+    try:
+        for _ in range(count):
+            ret, frame = cap.read()
+            if not ret: return
+            yield frame
+    finally:
+        cap.release()
+
+def _benchmark_backend(source, frames, backend, use_batcher, preview_size):
+    """Drive one detector backend through the live pipeline's code paths"""
+    warm = warm_up_models((backend,))
+    batcher = EmotionBatcher() if use_batcher else None
+    if batcher: batcher.start()
+    pipeline = EmotionPipeline(batcher=batcher, cascade=DetectorCascade([backend]))
+    gate = FrameChangeGate()
+    renderer = PreviewRenderer(None, None, preview_size)
+    timings = PipelineMetrics(window=frames)
+    last, count, analysed, faces = None, 0, 0, 0
+    cpu0, t0 = os.times(), time.perf_counter()
+    try:
+        for frame in _benchmark_frames(source, frames):
+            count += 1
+            # Same order as _main_loop: track, gate, analyse, then the preview conversion
+            t = time.perf_counter()
+            face_rect, rect = pipeline.track(frame)
+            timings.record("track", time.perf_counter() - t)
+            if gate.changed(frame, face_rect) or last is None:
+                t = time.perf_counter()
+                last = pipeline.analyze(frame, rect)
+                timings.record("analyse", time.perf_counter() - t)
+                analysed += 1
+                if last and last[1] is not None: faces += 1
+            t = time.perf_counter()
+            Image.fromarray(renderer.prepare(frame, face_rect, f"BENCH: {last[0] if last else '-'}"))
+            timings.record("render", time.perf_counter() - t)
+    finally:
+        if batcher: batcher.stop()
+    wall = time.perf_counter() - t0
+    cpu1 = os.times()
+    stages = timings.snapshot()["stages"]
+    busy = {stage: sum(timings.timings[stage]) for stage in stages}
+    st = pipeline.cascade.stats[backend]
+    return {
+        "frames": count, "analysed": analysed, "faces": faces, "warm_up_s": round(warm, 3),
+        "wall_s": round(wall, 3), "pipeline_fps": round(count / wall, 2) if wall else 0.0,
+        "inference_fps": round(analysed / busy["analyse"], 2) if busy.get("analyse") else 0.0,
+        "render_fps": round(count / busy["render"], 2) if busy.get("render") else 0.0,
+        "cpu_percent": round(100 * ((cpu1.user - cpu0.user) + (cpu1.system - cpu0.system)) / wall, 1) if wall else 0.0,
+        "detector_calls": st["calls"], "detector_failures": st["fail"],
+        "stages_ms": {stage: {k: round(v, 2) for k, v in vals.items() if k != "count"} for stage, vals in stages.items()},
+    }
+
+def _benchmark_backend_process(engine_settings, *args):
+    """_benchmark_backend in a fresh process, so its peak RSS covers only that backend's models"""
+    ENGINE_SETTINGS.update(engine_settings)
+    load_runtime_modules()
+    res = _benchmark_backend(*args)
+    res["peak_rss_mb"] = _peak_rss_mb()
+    return res
+
+def compare_benchmarks(old, new):
+    """Lines describing p50/throughput changes between two benchmark result dicts"""
+    lines = []
+    for backend, cur in new["backends"].items():
+        prev = old.get("backends", {}).get(backend)
+        if not prev or "error" in cur or "error" in prev: continue
+        for key in ("inference_fps", "render_fps", "pipeline_fps"):
+            if prev[key]: lines.append(f"  {backend:<11} {key:<14} {prev[key]:>8.1f} -> {cur[key]:>8.1f} "
+                                       f"({(cur[key] - prev[key]) / prev[key]:+.0%})")
+        p_old, p_new = prev["stages_ms"].get("analyse", {}), cur["stages_ms"].get("analyse", {})
+        if p_old.get("p50_ms"): lines.append(f"  {backend:<11} {'analyse p50':<14} {p_old['p50_ms']:>6.1f}ms -> "
+                                              f"{p_new.get('p50_ms', 0):>6.1f}ms")
+        if prev.get("peak_rss_mb") and cur.get("peak_rss_mb"):
+            lines.append(f"  {backend:<11} {'peak RSS':<14} {prev['peak_rss_mb']:>6.0f}MB -> {cur['peak_rss_mb']:>6.0f}MB")
+    return lines
+
+def run_benchmark(source, out_path, frames=300, detectors=None, use_batcher=True, compare=None):
+    """Benchmark each detector backend on recorded or synthetic frames and write JSON results"""
+    detectors = detectors or get_engine().detectors
+    preview_size = (530, 380)
+    results = {"time": datetime.now().isoformat(timespec="seconds"), "source": source, "frames": frames,
+               "python": sys.version.split()[0], "opencv": cv2.__version__, "cpu_count": os.cpu_count(),
+               "engine": dict(ENGINE_SETTINGS), "batcher": use_batcher, "preview_size": list(preview_size), "backends": {}}
+    if source != "synthetic":
+        results["capture"] = _benchmark_capture(source, frames)
+        for mode, cap in results["capture"].items():
+            print(f"Capture {mode:<8} {cap['fps']:>7.1f} fps | allocating {cap['alloc_mb_s']:.1f} MB/s")
+    for backend in detectors:
+        print(f"Benchmarking {backend}...")
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+                res = pool.submit(_benchmark_backend_process, dict(ENGINE_SETTINGS), source, frames, backend,
+                                  use_batcher, preview_size).result()
+        except Exception as e:
+            res = {"error": str(e)}
+        results["backends"][backend] = res
+        if "error" in res: print(f"  failed: {res['error']}")
+        else: print(f"  {res['frames']} frames | inference {res['inference_fps']:.1f} fps | "
+                    f"render {res['render_fps']:.0f} fps | cpu {res['cpu_percent']:.0f}% | "
+                    f"analyse p95 {res['stages_ms'].get('analyse', {}).get('p95_ms', 0):.0f} ms | "
+                    f"peak RSS {res['peak_rss_mb'] or 0:.0f} MB")
+    with open(out_path, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+    print(f"Results -> {out_path}")
+    if compare:
+        with open(compare, encoding="utf-8") as f: old = json.load(f)
+        print(f"Compared with {compare}:")
+        for line in compare_benchmarks(old, results): print(line)
+    return results
+
+def _calibration_faces(folder, samples):
+    """Up to `samples` images under `folder` (searched recursively) as emotion model inputs"""
+    paths = sorted(os.path.join(root, f) for root, _, files in os.walk(folder)
+                   for f in files if f.lower().endswith(IMAGE_EXTS))
+    step = max(1, len(paths) // samples)
+    faces = (cv2.imread(p) for p in paths[::step][:samples])
+    return [emotion_input(face)[..., None] for face in faces if face is not None]
+
+def convert_emotion_model(precisions, out_dir=None, calibration=None, samples=200):
+    """One-time conversion of DeepFace's cached Keras emotion model to TFLite files.
+
+    float16 stores the weights as half floats. int8 quantizes weights and
+    activations using `calibration` (a folder of face crops) as the
+    representative dataset; without it only the weights are int8 (dynamic
+    range). Inputs and outputs stay float32. Returns {precision: path}.
+    """
+    import tensorflow as tf
+    model = DeepFace.build_model("Emotion")
+    out_dir = out_dir or QUANTIZED_MODELS["dir"]
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"Float32 model: {model.count_params() * 4 / 2**20:.1f} MB of weights")
+    paths = {}
+    for precision in precisions:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if precision == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif precision == "int8" and calibration:
+            faces = _calibration_faces(calibration, samples)
+            if not faces: raise ValueError(f"No calibration images found in {calibration}")
+            converter.representative_dataset = lambda: ([face[None]] for face in faces)
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            print(f"int8: calibrating on {len(faces)} images")
+        elif precision == "int8":
+            print("int8: no --calibration folder, quantizing weights only (dynamic range)")
+        else:
+            raise ValueError(f"Unknown precision: {precision}")
+        paths[precision] = os.path.join(out_dir, QUANTIZED_MODELS[precision])
+        with open(paths[precision], "wb") as f: f.write(converter.convert())
+        print(f"{precision}: {paths[precision]} ({os.path.getsize(paths[precision]) / 2**20:.1f} MB)")
+    return paths
+
+def _labeled_faces(folder):
+    """(label, path) for every folder/<emotion>/<image>; other subfolders are skipped"""
+    for label in sorted(os.listdir(folder)):
+        sub = os.path.join(folder, label)
+        if label.lower() not in EMOTION_LABELS or not os.path.isdir(sub): continue
+        for f in sorted(os.listdir(sub)):
+            if f.lower().endswith(IMAGE_EXTS): yield label.lower(), os.path.join(sub, f)
+
+def compare_emotion_models(folder, out_path, precisions):
+    """Accuracy, agreement and latency of quantized emotion models against the float one.
+
+    `folder` holds face crops sorted into one subfolder per emotion label
+    (FER-style). Agreement and score drift are measured against the float32
+    prediction for the same image. Writes a JSON report and returns it.
+    """
+    engines = {name: get_engine({"emotion_model": name}) for name in ["float32"] + list(precisions)}
+    dummy = np.zeros((48, 48, 3), dtype=np.uint8)
+    stats = {}
+    for name, engine in engines.items():
+        engine.classify(dummy)
+        stats[name] = {"correct": 0, "agree": 0, "drift": 0.0, "latency": [], "labels": {}}
+    count = 0
+    for label, path in _labeled_faces(folder):
+        face = cv2.imread(path)
+        if face is None: continue
+        count += 1
+        ref = None
+        for name, engine in engines.items():
+            t0 = time.perf_counter()
+            emo, scores = engine.classify(face)
+            st = stats[name]
+            st["latency"].append(time.perf_counter() - t0)
+            st["correct"] += emo == label
+            per_label = st["labels"].setdefault(label, [0, 0])
+            per_label[0] += emo == label
+            per_label[1] += 1
+            if ref is None:
+                ref = emo, scores
+            else:
+                st["agree"] += emo == ref[0]
+                st["drift"] += sum(abs(scores[k] - ref[1][k]) for k in EMOTION_LABELS) / len(EMOTION_LABELS)
+    if not count: raise ValueError(f"No labeled images in {folder} (expected <folder>/<emotion>/<image>)")
+    report = {"time": datetime.now().isoformat(timespec="seconds"), "folder": folder, "images": count,
+              "engine": dict(ENGINE_SETTINGS), "models": {}}
+    for name, st in stats.items():
+        engine = engines[name]
+        lat = np.array(st["latency"]) * 1000
+        size = os.path.getsize(engine.path) if isinstance(engine, QuantizedEmotionEngine) else \
+            engine._model().count_params() * 4 if isinstance(engine, DeepFaceEngine) else None
+        report["models"][name] = {
+            "engine": engine.name, "accuracy": round(st["correct"] / count, 4),
+            "agreement": round(st["agree"] / count, 4) if name != "float32" else 1.0,
+            "mean_score_drift_pct": round(st["drift"] / count, 3),
+            "p50_ms": round(float(np.percentile(lat, 50)), 2), "p95_ms": round(float(np.percentile(lat, 95)), 2),
+            "size_mb": round(size / 2**20, 3) if size else None,
+            "per_label": {k: round(c / n, 4) for k, (c, n) in sorted(st["labels"].items())},
+        }
+    with open(out_path, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    print(f"{count} labeled images from {folder}")
+    print(f"  {'model':<8} {'accuracy':>8} {'agree':>7} {'drift':>7} {'p50':>8} {'p95':>8} {'size':>8}")
+    for name, m in report["models"].items():
+        size = f"{m['size_mb']:.1f} MB" if m["size_mb"] is not None else "--"
+        print(f"  {name:<8} {m['accuracy']:>8.1%} {m['agreement']:>7.1%} {m['mean_score_drift_pct']:>6.2f}% "
+              f"{m['p50_ms']:>6.2f}ms {m['p95_ms']:>6.2f}ms {size:>8}")
+    print(f"Report -> {out_path}")
+    return report
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Neural Mood Pro emotion tracker")
+    parser.add_argument("--batch", metavar="PATH", help="Score a video file or image folder without the UI")
+    parser.add_argument("--out", default="emotion_batch.csv", help="Batch output file (.csv or .jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="Batch worker processes (default: cores - 1)")
+    parser.add_argument("--chunk", type=int, default=200, help="Frames per worker task")
+    parser.add_argument("--stride", type=int, default=1, help="Analyse every Nth frame")
+    parser.add_argument("--engine", choices=sorted(INFERENCE_ENGINES), default="deepface",
+                        help="Inference engine: DeepFace/TensorFlow, or cv2.dnn with local ONNX/Caffe models")
+    parser.add_argument("--threads", type=int, help="Thread cap for the inference engine (TensorFlow or OpenCV)")
+    parser.add_argument("--model-dir", help=f"Model files for opencv-dnn and quantized emotion models (default: {DNN_MODELS['dir']})")
+    parser.add_argument("--emotion-model", choices=EMOTION_MODELS, default="float32",
+                        help="Emotion model precision; float16/int8 need a --quantize run first")
+    parser.add_argument("--detectors", default=None,
+                        help="Detector backend cascade, in order of preference (default: the engine's detectors)")
+    parser.add_argument("--cache", metavar="DB", help="On-disk emotion result cache for batch mode (SQLite)")
+    parser.add_argument("--benchmark", metavar="SOURCE",
+                        help="Benchmark the pipeline on a video file, or 'synthetic' for generated frames")
+    parser.add_argument("--frames", type=int, default=300, help="Frames per backend in benchmark mode")
+    parser.add_argument("--bench-out", default="benchmark.json", help="Benchmark results file")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier benchmark results to compare against")
+    parser.add_argument("--no-batcher", action="store_true", help="Benchmark without the emotion micro-batcher")
+    parser.add_argument("--quantize", metavar="PRECISIONS",
+                        help="Convert the emotion model to TFLite, e.g. 'float16,int8', and exit")
+    parser.add_argument("--calibration", metavar="DIR", help="Face images for int8 calibration")
+    parser.add_argument("--compare-models", metavar="DIR",
+                        help="Report accuracy of the quantized models on DIR/<emotion>/<image> and exit")
+    parser.add_argument("--report-out", default="emotion_models.json", help="Model comparison report file")
+    parser.add_argument("--capture-buffer", type=int, default=CAPTURE_DEFAULTS["buffer_size"],
+                        help="Camera driver buffer size in frames (default for the app's picker)")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Periodically write pipeline metrics as JSON (and PATH.prom as Prometheus text)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics dumps")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics and /metrics.json on localhost")
+    args = parser.parse_args()
+    CAPTURE_DEFAULTS["buffer_size"] = args.capture_buffer
+    ENGINE_SETTINGS.update(engine=args.engine, threads=args.threads, model_dir=args.model_dir,
+                           emotion_model=args.emotion_model)
+    detectors = [d.strip() for d in (args.detectors or "").split(",") if d.strip()] or None
+    precisions = [p.strip() for p in (args.quantize or "").split(",") if p.strip()]
+
+    if args.batch or args.benchmark or args.quantize or args.compare_models:
+        if args.quantize: ENGINE_SETTINGS["engine"] = "deepface"  # The conversion source is DeepFace's model
+        missing = {k: v for k, v in load_runtime_modules().items() if k != "pyttsx3"}
+        if missing:
+            print(f"Missing Library Error: {', '.join(f'{k}: {v}' for k, v in missing.items())}")
+            sys.exit(1)
+
+    if args.quantize:
+        convert_emotion_model(precisions, args.model_dir, args.calibration)
+        sys.exit(0)
+
+    if args.compare_models:
+        # --emotion-model narrows the report to one quantized model, otherwise every converted one is included
+        model_dir = args.model_dir or QUANTIZED_MODELS["dir"]
+        chosen = [args.emotion_model] if args.emotion_model != "float32" else \
+            [p for p in EMOTION_MODELS[1:] if os.path.exists(os.path.join(model_dir, QUANTIZED_MODELS[p]))]
+        compare_emotion_models(args.compare_models, args.report_out, chosen)
+        sys.exit(0)
+
+    if args.batch:
+        run_batch(args.batch, args.out, args.workers, args.chunk, args.stride, detectors, args.cache)
+        sys.exit(0)
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.bench_out, args.frames, detectors, not args.no_batcher, args.compare)
+        sys.exit(0)
+
+    if args.metrics_file: METRICS.start_dump(args.metrics_file, args.metrics_interval)
+    if args.metrics_port: METRICS.serve(args.metrics_port)
     root = ctk.CTk()
     app = EmotionTrackerApp(root)
     root.mainloop()